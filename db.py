@@ -1,14 +1,84 @@
+import csv
 import os
 import sqlite3
 import shutil
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
 import pandas as pd
+import streamlit as st
 
 ROOT_DIR = Path(__file__).resolve().parent
 REPO_DB = ROOT_DIR / "awlmix.db"
 
+# Hot statements as module constants: the same SQL text on the cached connection
+# hits sqlite3's prepared-statement cache instead of being re-parsed per call.
+_SQL_INSERT_TXN = """
+    INSERT INTO InventoryTxn
+    (TxnTime, MaterialID, LocationID, LotNumber, TxnType, Qty, UOM, Notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# OnHandBalance is the running total per (material, location, UOM), so reads
+# no longer re-sum InventoryTxn. Invariant: Qty == SUM(InventoryTxn.Qty) for the
+# key. Triggers on InventoryTxn maintain it for every insert/update/delete,
+# whichever code path writes the ledger.
+_SQL_BALANCE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS OnHandBalance (
+        MaterialID INTEGER,
+        LocationID INTEGER,
+        UOM TEXT,
+        Qty REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (MaterialID, LocationID, UOM)
+    );
+"""
+
+_SQL_BALANCE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_txn_balance_ins AFTER INSERT ON InventoryTxn
+    BEGIN
+        INSERT INTO OnHandBalance (MaterialID, LocationID, UOM, Qty)
+        VALUES (NEW.MaterialID, NEW.LocationID, NEW.UOM, COALESCE(NEW.Qty, 0))
+        ON CONFLICT(MaterialID, LocationID, UOM) DO UPDATE SET Qty = Qty + excluded.Qty;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_txn_balance_del AFTER DELETE ON InventoryTxn
+    BEGIN
+        UPDATE OnHandBalance SET Qty = Qty - COALESCE(OLD.Qty, 0)
+        WHERE MaterialID = OLD.MaterialID AND LocationID = OLD.LocationID AND UOM = OLD.UOM;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_txn_balance_upd
+    AFTER UPDATE OF MaterialID, LocationID, UOM, Qty ON InventoryTxn
+    BEGIN
+        UPDATE OnHandBalance SET Qty = Qty - COALESCE(OLD.Qty, 0)
+        WHERE MaterialID = OLD.MaterialID AND LocationID = OLD.LocationID AND UOM = OLD.UOM;
+        INSERT INTO OnHandBalance (MaterialID, LocationID, UOM, Qty)
+        VALUES (NEW.MaterialID, NEW.LocationID, NEW.UOM, COALESCE(NEW.Qty, 0))
+        ON CONFLICT(MaterialID, LocationID, UOM) DO UPDATE SET Qty = Qty + excluded.Qty;
+    END;
+    """,
+)
+
+_SQL_ONHAND = """
+    SELECT
+      m.MaterialCode,
+      m.MaterialName,
+      l.LocationCode,
+      b.UOM,
+      SUM(b.Qty) AS OnHand
+    FROM OnHandBalance b
+    JOIN MaterialMaster m ON m.MaterialID = b.MaterialID
+    JOIN Locations l ON l.LocationID = b.LocationID
+    GROUP BY m.MaterialCode, m.MaterialName, l.LocationCode, b.UOM
+    HAVING SUM(b.Qty) <> 0
+    ORDER BY m.MaterialCode, l.LocationCode;
+"""
+
 def _is_windows() -> bool:
     return os.name == "nt"
 
@@ -33,18 +103,71 @@ def ensure_db():
         if REPO_DB.exists():
             shutil.copy2(REPO_DB, DB_PATH)
 
+@st.cache_resource
 def get_conn():
+    """One shared connection per server process (kept open across reruns)."""
     ensure_db()
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -65536;")      # ~64 MB page cache
+    conn.execute("PRAGMA mmap_size = 268435456;")    # 256 MB memory-mapped reads
+    conn.execute("PRAGMA busy_timeout = 5000;")
+    # Every page goes through here, so the balance table exists even when a
+    # page is opened directly (init_db only runs from the main page).
+    with conn:
+        _ensure_onhand_balance(conn)
     return conn
 
 
+def _ensure_onhand_balance(conn):
+    """Create OnHandBalance; once InventoryTxn exists, add its triggers and backfill an empty table."""
+    conn.execute(_SQL_BALANCE_SCHEMA)
+    has_ledger = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'InventoryTxn';"
+    ).fetchone()
+    if not has_ledger:
+        return
+    for stmt in _SQL_BALANCE_TRIGGERS:
+        conn.execute(stmt)
+    # Backfill once from the ledger (new table on an existing DB)
+    if conn.execute("SELECT 1 FROM OnHandBalance LIMIT 1;").fetchone() is None:
+        conn.execute("""
+        INSERT INTO OnHandBalance (MaterialID, LocationID, UOM, Qty)
+        SELECT MaterialID, LocationID, UOM, SUM(COALESCE(Qty, 0))
+        FROM InventoryTxn
+        GROUP BY MaterialID, LocationID, UOM;
+        """)
+
+
+# The cached connection is shared by every session thread. sqlite3 has one
+# transaction per connection, so without this lock one session's commit or
+# rollback could end another's transaction mid-way.
+_DB_LOCK = threading.RLock()
+
+
+@contextmanager
+def locked_conn():
+    """The shared connection, held exclusively for the duration of the with-block."""
+    with _DB_LOCK:
+        yield get_conn()
 
 
 def init_db():
-    conn = get_conn()
+    with locked_conn() as conn:
+        # One transaction for all schema + seed statements. The with-block commits
+        # it, or rolls it back on error so the shared connection is never left
+        # inside a half-applied schema.
+        conn.execute("BEGIN;")
+        with conn:
+            _init_db(conn)
+        conn.execute("ANALYZE;")
+
+
+def _init_db(conn):
     cur = conn.cursor()
 
     cur.execute("""
@@ -78,101 +201,163 @@ def init_db():
     );
     """)
 
-    for loc in ["AWLMIX", "CENTRAL", "F_WAREHOUSE"]:
-        cur.execute("INSERT OR IGNORE INTO Locations(LocationCode) VALUES (?);", (loc,))
+    _ensure_onhand_balance(conn)
+
+    # MaterialCode lookups use the UNIQUE constraint's autoindex; drop the duplicate
+    cur.execute("DROP INDEX IF EXISTS ix_material_code;")
 
-    conn.commit()
-    conn.close()
+    # On-hand reads use OnHandBalance, so the old ledger aggregate indexes only
+    # cost writes on every insert; drop them from databases that still have them
+    cur.execute("DROP INDEX IF EXISTS ix_txn_mat_loc_uom;")
+    cur.execute("DROP INDEX IF EXISTS ix_txn_loc_uom;")
+
+    locs = ["AWLMIX", "CENTRAL", "F_WAREHOUSE"]
+    cur.execute(
+        "INSERT INTO Locations(LocationCode) VALUES "
+        + ", ".join(["(?)"] * len(locs))
+        + " ON CONFLICT(LocationCode) DO NOTHING;",
+        locs,
+    )
 
 
 def load_materials_from_csv(csv_path="MaterialMaster.csv"):
-    conn = get_conn()
-    df = pd.read_csv(csv_path)
+    # Seed only once — the table is the source of truth after the first load
+    with locked_conn() as conn:
+        if conn.execute("SELECT 1 FROM MaterialMaster LIMIT 1;").fetchone():
+            return
 
-    for _, r in df.iterrows():
-        conn.execute("""
+    # Write-only path: stdlib csv straight to tuples, no DataFrame needed
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        rows = [(r["MaterialCode"], r["MaterialName"]) for r in csv.DictReader(f)]
+
+    with locked_conn() as conn, conn:
+        conn.executemany("""
             INSERT OR IGNORE INTO MaterialMaster (MaterialCode, MaterialName)
             VALUES (?, ?)
-        """, (r["MaterialCode"], r["MaterialName"]))
+        """, rows)
 
-    conn.commit()
-    conn.close()
 
+def _fetch_df(sql: str, params=()) -> pd.DataFrame:
+    """Small result sets: cursor rows straight into a DataFrame, no read_sql adapter."""
+    with locked_conn() as conn:
+        cur = conn.execute(sql, params)
+        rows = cur.fetchall()
+    return pd.DataFrame([tuple(r) for r in rows], columns=[d[0] for d in cur.description])
 
-def get_materials():
-    conn = get_conn()
-    df = pd.read_sql_query(
-        """
+
+def _table_version(table: str):
+    """Cheap change token for append-only tables: MAX(rowid) is a single b-tree seek."""
+    with locked_conn() as conn:
+        return conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_materials(version):
+    return _fetch_df("""
         SELECT MaterialID, MaterialCode, MaterialName
         FROM MaterialMaster
         ORDER BY MaterialID
-        """,
-        conn,
-    )
-    conn.close()
-    return df
+    """)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_locations(version):
+    return _fetch_df("""
+        SELECT LocationID, LocationCode
+        FROM Locations
+        ORDER BY LocationCode
+    """)
+
+
+def get_materials():
+    return _load_materials(_table_version("MaterialMaster"))
 
 
 def get_locations():
-    conn = get_conn()
-    df = pd.read_sql("SELECT * FROM Locations ORDER BY LocationCode", conn)
-    conn.close()
-    return df
+    return _load_locations(_table_version("Locations"))
 
 
 def add_txn(material_id, location_id, lot, txn_type, qty, uom, notes):
-    conn = get_conn()
-    conn.execute("""
-        INSERT INTO InventoryTxn
-        (TxnTime, MaterialID, LocationID, LotNumber, TxnType, Qty, UOM, Notes)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datetime.now().isoformat(timespec="seconds"),
-        material_id,
-        location_id,
-        lot,
-        txn_type,
-        qty,
-        uom,
-        notes
-    ))
-    conn.commit()
-    conn.close()
+    add_txns([(material_id, location_id, lot, txn_type, qty, uom, notes)])
 
 
-def get_on_hand():
-    conn = get_conn()
-    df = pd.read_sql("""
-        SELECT
-          m.MaterialCode,
-          m.MaterialName,
-          l.LocationCode,
-          t.UOM,
-          ROUND(SUM(t.Qty), 4) AS OnHand
-        FROM InventoryTxn t
-        JOIN MaterialMaster m ON m.MaterialID = t.MaterialID
-        JOIN Locations l ON l.LocationID = t.LocationID
-        GROUP BY m.MaterialCode, m.MaterialName, l.LocationCode, t.UOM
-        HAVING SUM(t.Qty) <> 0
-        ORDER BY m.MaterialCode, l.LocationCode;
-    """, conn)
-    conn.close()
+def add_txns(rows):
+    """
+    Post many ledger lines in one transaction.
+
+    rows: iterable of (material_id, location_id, lot, txn_type, qty, uom, notes).
+    All lines share one TxnTime. Returns the number of lines posted.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    txn_time = datetime.now().isoformat(timespec="seconds")
+    with locked_conn() as conn, conn:
+        # OnHandBalance follows via the InventoryTxn triggers
+        conn.executemany(_SQL_INSERT_TXN, ((txn_time, *row) for row in rows))
+    clear_onhand_cache()
+    return len(rows)
+
+
+def clear_onhand_cache():
+    """Drop cached on-hand results so the next read sees new ledger rows."""
+    _load_on_hand.clear()
+    get_feasibility.clear()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_on_hand(version):
+    with locked_conn() as conn:
+        df = pd.read_sql(_SQL_ONHAND, conn)
+    df["OnHand"] = df["OnHand"].round(4)
     return df
 
 
-def get_on_hand_by_location(location_code: str, uom: str = "LB"):
-    conn = get_conn()
-    df = pd.read_sql("""
+def get_on_hand():
+    # Keyed on the newest TxnID so ledger writes from any process invalidate it
+    return _load_on_hand(_table_version("InventoryTxn"))
+
+
+@st.cache_data(ttl=30)
+def get_feasibility(required_rows, location_code: str, uom: str = "LB"):
+    """
+    Required-vs-on-hand in one query.
+
+    required_rows: tuple of (MaterialKey, RequiredQty) pairs (hashable, for the cache).
+      MaterialKey is a MaterialCode (the page maps BOM IDs through MaterialMaster.csv);
+      a key with no matching code gets OnHand 0. Repeated keys are summed first, so
+      each material is one row compared against its on-hand once.
+    Returns Material, RequiredLB, OnHand (0 when nothing is on hand).
+    """
+    required_rows = list(required_rows)
+    if not required_rows:
+        return pd.DataFrame({"Material": [], "RequiredLB": [], "OnHand": []})
+
+    # Inline VALUES CTE instead of a temp table: no writes on the shared connection
+    values_sql = ", ".join(["(?, ?)"] * len(required_rows))
+    params = [v for row in required_rows for v in row] + [uom, location_code]
+
+    with locked_conn() as conn:
+        df = pd.read_sql_query(f"""
+        WITH bom_req(MaterialKey, RequiredLB) AS (VALUES {values_sql}),
+        req AS (
+          SELECT MaterialKey, SUM(RequiredLB) AS RequiredLB
+          FROM bom_req
+          GROUP BY MaterialKey
+        )
         SELECT
-          m.MaterialCode AS MaterialCode,
-          ROUND(SUM(t.Qty), 4) AS OnHand
-        FROM InventoryTxn t
-        JOIN MaterialMaster m ON m.MaterialID = t.MaterialID
-        JOIN Locations l ON l.LocationID = t.LocationID
-        WHERE l.LocationCode = ?
-          AND t.UOM = ?
-        GROUP BY m.MaterialCode
-    """, conn, params=(location_code, uom))
-    conn.close()
+          r.MaterialKey AS Material,
+          r.RequiredLB,
+          COALESCE(t.Qty, 0) AS OnHand
+        FROM req r
+        LEFT JOIN MaterialMaster m
+          ON m.MaterialCode = r.MaterialKey
+        LEFT JOIN OnHandBalance t
+          ON t.MaterialID = m.MaterialID
+         AND t.UOM = ?
+         AND t.LocationID = (SELECT LocationID FROM Locations WHERE LocationCode = ?)
+        ORDER BY Material
+        """, conn, params=params)
+    df["OnHand"] = df["OnHand"].round(4)
     return df
-
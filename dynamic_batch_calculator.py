@@ -7,9 +7,15 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Initialize database ---
-init_db()
-load_materials_from_csv()
+# --- Initialize database (once per server process, not every rerun) ---
+@st.cache_resource
+def _bootstrap():
+    init_db()
+    load_materials_from_csv()
+    return True
+
+
+_bootstrap()
 
 st.title("AWLMIX Operations Tools")
 st.caption("Manufacturing • Inventory • Feasibility • Batch Control")
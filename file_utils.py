@@ -0,0 +1,11 @@
+"""Small file helpers shared by the pages (no Streamlit dependency)."""
+import os
+
+
+def file_stamp(path) -> tuple[int, int] | None:
+    """(mtime_ns, size) from one stat — cache key part so an edited file reloads; None when missing."""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
@@ -1,42 +1,58 @@
+import csv
 import os
 DEBUG = os.getenv("DEBUG", "0") == "1"
 import streamlit as st
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+def sniff_sep(path: Path) -> str:
+    """Detect the delimiter from the first 8 KB instead of trial-parsing the file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(8192)
+
+    # Fast path: only one candidate appears in the header line
+    header = sample.splitlines()[0] if sample else ""
+    present = [d for d in ",\t|;" if d in header]
+    if len(present) == 1:
+        return present[0]
+
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",\t|;").delimiter
+    except csv.Error:
+        return ","
+
+
+def read_sniffed(path: Path, **kwargs) -> pd.DataFrame:
+    """One C-engine parse with the sniffed delimiter; python engine only for malformed files."""
+    sep = sniff_sep(path)
+    try:
+        df = pd.read_csv(path, sep=sep, **kwargs)
+    except pd.errors.ParserError:
+        df = pd.read_csv(path, sep=sep, engine="python", **kwargs)
+
+    # A wrong sniff collapses every row into one column; comma is the house format
+    if df.shape[1] == 1 and sep != ",":
+        df = pd.read_csv(path, sep=",", **kwargs)
+    return df
+
+
 def read_csv_flexible_silent(path: Path) -> pd.DataFrame:
-    seps = [",", "\t", "|", ";"]
-    best_df = None
-    best_cols = 0
-    last_err = None
-
-    for sep in seps:
-        try:
-            df = pd.read_csv(
-                path,
-                sep=sep,
-                engine="python",
-                dtype=str,
-                keep_default_na=False,
-                on_bad_lines="skip",
-            )
-            if df.shape[1] > best_cols:
-                best_df = df
-                best_cols = df.shape[1]
-        except Exception as e:
-            last_err = e
-
-    if best_df is None:
-        raise last_err
-
-    best_df.columns = (
-        pd.Index(best_df.columns)
+    df = read_sniffed(
+        path,
+        dtype=str,
+        keep_default_na=False,
+        on_bad_lines="skip",
+    )
+
+    df.columns = (
+        pd.Index(df.columns)
         .astype(str)
         .str.replace("\ufeff", "", regex=False)
         .str.strip()
     )
-    return best_df
+    return df
 
 
 
@@ -45,7 +61,8 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from db import get_on_hand_by_location
+from db import get_feasibility
+from file_utils import file_stamp
 
 st.title("Feasibility Check (Inventory vs BOM)")
 
@@ -57,29 +74,67 @@ MATERIAL_MASTER_CSV = ROOT_DIR / "MaterialMaster.csv"
 
 
 def read_csv_flexible(path: Path) -> pd.DataFrame:
-    """Tries common delimiters and returns best result."""
+    """Sniffs the delimiter and reads the file in one pass."""
     if not path.exists():
         st.error(f"Missing file: {path.name}")
         st.stop()
 
-    seps = [",", "\t", "|", ";"]
-    best_df = None
-    best_cols = 0
-
-    for sep in seps:
-        try:
-            df = pd.read_csv(path, sep=sep, engine="python")
-            if df.shape[1] > best_cols:
-                best_cols = df.shape[1]
-                best_df = df
-        except Exception:
-            continue
-
-    if best_df is None:
-        best_df = pd.read_csv(path, engine="python")
-
-    best_df.columns = [str(c).strip() for c in best_df.columns]
-    return best_df
+    df = read_sniffed(path)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def load_table(path: Path, stamp: tuple[int, int]) -> pd.DataFrame:
+    """Cached parse; stamp is part of the key so an edited file reloads."""
+    return read_csv_flexible_silent(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def index_by_product(path: Path, stamp: tuple[int, int]) -> dict[str, pd.DataFrame]:
+    """
+    ProductID -> rows, built once per file version so lookups are a dict hit.
+    Shared (not copied) across reruns and sessions: callers must not mutate the frames.
+    """
+    df = load_table(path, stamp)
+    keys = df["ProductID"].astype(str).str.strip()
+    return {pid: grp for pid, grp in df.groupby(keys, sort=False)}
+
+
+@st.cache_data(show_spinner=False)
+def compute_required(path: Path, stamp: tuple[int, int], product_id: str, total_weight_lb: float) -> pd.DataFrame:
+    """
+    Required LB per BOM row for one product and batch weight (summed per material
+    by the page, after the ID -> code mapping).
+    Location / UOM toggles don't change this, so they reuse the cached result.
+    """
+    bom_rows = index_by_product(path, stamp)[product_id]
+
+    # Your "Percent" is a FRACTION (0..1). Do NOT divide by 100.
+    frac = pd.to_numeric(bom_rows["Percent"], errors="coerce").to_numpy()
+
+    # MaterialCode in BOM currently appears numeric (MaterialID); the page maps it
+    # to OGxxxx through MaterialMaster.csv before the on-hand lookup.
+    return pd.DataFrame({
+        "Material": bom_rows["MaterialCode"].astype(str).str.strip().to_numpy(),
+        "RequiredLB": total_weight_lb * frac,
+    }).dropna(subset=["RequiredLB"])
+
+
+@st.cache_data(show_spinner=False)
+def load_material_codes(path: Path, stamp: tuple[int, int]) -> dict[str, str]:
+    """
+    MaterialID -> MaterialCode from MaterialMaster.csv. The BOM file keys materials
+    by these CSV IDs, which need not match the database's autoincrement IDs.
+    """
+    mm = load_table(path, stamp)
+    cols = {c.lower(): c for c in mm.columns}
+    if "materialid" not in cols or "materialcode" not in cols:
+        return {}
+    ids = mm[cols["materialid"]].astype(str).str.strip()
+    codes = mm[cols["materialcode"]].astype(str).str.strip()
+    keep = (ids != "") & (codes != "")
+    return dict(zip(ids[keep], codes[keep]))
 
 
 def require_columns(df: pd.DataFrame, required: list, filename: str):
@@ -91,9 +146,12 @@ def require_columns(df: pd.DataFrame, required: list, filename: str):
 
 
 # ---------- Load tables ----------
-prod_df = read_csv_flexible_silent(PRODUCT_MASTER_PATH)
-wt_df   = read_csv_flexible_silent(WEIGHT_TARGETS_PATH)
-bom_df  = read_csv_flexible_silent(BOM_PATH)
+wt_stamp = file_stamp(WEIGHT_TARGETS_PATH)
+bom_stamp = file_stamp(BOM_PATH)
+
+prod_df = load_table(PRODUCT_MASTER_PATH, file_stamp(PRODUCT_MASTER_PATH))
+wt_df   = load_table(WEIGHT_TARGETS_PATH, wt_stamp)
+bom_df  = load_table(BOM_PATH, bom_stamp)
 
 
 # normalize column names
@@ -107,32 +165,6 @@ for df in (prod_df, wt_df, bom_df):
 
 
 
-# ---------- Material mapping (MaterialID -> MaterialCode) ----------
-
-mat_id_to_code = {}
-
-if MATERIAL_MASTER_CSV.exists():
-    mm = pd.read_csv(MATERIAL_MASTER_CSV, dtype=str)
-    mm.columns = mm.columns.str.strip()
-
-    # normalize column names
-    mm_cols = {c.lower(): c for c in mm.columns}
-
-    if "materialid" in mm_cols and "materialcode" in mm_cols:
-        mid_col = mm_cols["materialid"]
-        code_col = mm_cols["materialcode"]
-
-        mat_id_to_code = (
-            mm[[mid_col, code_col]]
-            .dropna()
-            .astype(str)
-            .set_index(mid_col)[code_col]
-            .to_dict()
-        )
-
-    #st.caption(f"Loaded MaterialMaster.csv → {len(mat_id_to_code)} material mappings")
-
-
 # ---------- Validate schema ----------
 require_columns(prod_df, ["ProductID", "ProductCode", "ProductName"], "ProductMaster.txt")
 require_columns(bom_df, ["ProductID", "MaterialCode", "Percent"], "ProductMaterialUsage.txt")
@@ -191,7 +223,9 @@ with c3:
     compare_uom = st.selectbox("Inventory UOM", ["LB"], index=0)  # lock to LB for now
 
 # ---------- Weight target ----------
-wt_match = wt_df.loc[     (wt_df["ProductID"].astype(str).str.strip() == product_id)     & (wt_df["UnitType"].astype(str).str.strip() == unit_type) ]
+wt_by_id = index_by_product(WEIGHT_TARGETS_PATH, wt_stamp)
+wt_prod = wt_by_id.get(product_id, wt_df.iloc[0:0])
+wt_match = wt_prod.loc[wt_prod["UnitType"].astype(str).str.strip() == unit_type]
 if wt_match.empty:
     st.error(f"No weight target found for ProductID {product_id} ({product_code}).")
     st.stop()
@@ -212,38 +246,34 @@ else:
     st.write(f"**Total batch weight:** {total_weight_lb:.4f} LB / {total_weight_g:.2f} G")
 
 # ---------- BOM requirements ----------
-bom_rows = bom_df.loc[bom_df["ProductID"].astype(str) == product_id].copy()
-if bom_rows.empty:
+if product_id not in index_by_product(BOM_PATH, bom_stamp):
     st.error(f"No BOM rows found for ProductID {product_id} ({product_code}).")
     st.stop()
 
-# Your "Percent" is a FRACTION (0..1). Do NOT divide by 100.
-bom_rows["Frac"] = pd.to_numeric(bom_rows["Percent"], errors="coerce")
-bom_rows = bom_rows.dropna(subset=["Frac"])
+required_df = compute_required(BOM_PATH, bom_stamp, product_id, total_weight_lb)
 
-# MaterialCode in BOM currently appears numeric (MaterialID). Map to OGxxxx using MaterialMaster.csv if possible.
-bom_rows["MaterialKey"] = bom_rows["MaterialCode"].astype(str).str.strip()
-
-if mat_id_to_code:
-    bom_rows["Material"] = bom_rows["MaterialKey"].apply(lambda k: mat_id_to_code.get(k, k))
-else:
-    # If no mapping exists, we just use whatever is in BOM
-    bom_rows["Material"] = bom_rows["MaterialKey"]
-
-# Required in LB
-bom_rows["RequiredLB"] = total_weight_lb * bom_rows["Frac"]
-required_df = bom_rows.groupby("Material", as_index=False)["RequiredLB"].sum()
-
-# ---------- On-hand ----------
-onhand_df = get_on_hand_by_location(location_code, uom=compare_uom)
-if onhand_df.empty:
-    onhand_df = pd.DataFrame({"MaterialCode": [], "OnHand": []})
+# ---------- Material mapping (MaterialID -> MaterialCode) ----------
+mat_id_to_code = (
+    load_material_codes(MATERIAL_MASTER_CSV, file_stamp(MATERIAL_MASTER_CSV))
+    if MATERIAL_MASTER_CSV.exists() else {}
+)
+materials = required_df["Material"].astype(str)
+# Map first, then sum: BOM keys that resolve to the same code become one requirement
+required_df = (
+    required_df.assign(Material=materials.map(mat_id_to_code).fillna(materials))
+    .groupby("Material", as_index=False)["RequiredLB"].sum()
+)
 
-merged = required_df.merge(onhand_df, how="left", left_on="Material", right_on="MaterialCode")
-merged["OnHand"] = merged["OnHand"].fillna(0.0)
+# ---------- On-hand (joined in SQL) ----------
+merged = get_feasibility(
+    tuple(zip(required_df["Material"], required_df["RequiredLB"].astype(float))),
+    location_code,
+    uom=compare_uom,
+)
 
 merged["Shortage"] = (merged["RequiredLB"] - merged["OnHand"]).round(4)
-merged["Status"] = merged["Shortage"].apply(lambda x: "FAIL" if x > 0 else "PASS")
+short_mask = merged["Shortage"].to_numpy() > 0
+merged["Status"] = np.where(short_mask, "FAIL", "PASS")
 
 # ---------- Output ----------
 st.subheader("Feasibility Results (LB)")
@@ -252,7 +282,7 @@ out = merged[["Material", "RequiredLB", "OnHand", "Shortage", "Status"]].copy()
 out = out.rename(columns={"RequiredLB": "Required (LB)"})
 st.dataframe(out, use_container_width=True, hide_index=True)
 
-fails = int((out["Status"] == "FAIL").sum())
+fails = int(short_mask.sum())
 if fails == 0:
     st.success("✅ FEASIBLE: Inventory is sufficient for this batch.")
 else:
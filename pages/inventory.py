@@ -11,280 +11,405 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from db import get_materials, get_locations, add_txn, get_on_hand
+from db import get_materials, get_locations, add_txns, get_on_hand
+import session_store
 
 st.title("Inventory")
 
+@st.cache_resource(ttl=3600)
+def prune_sessions() -> int:
+    """Drop stale on-disk session files; runs at most once an hour per server process."""
+    return session_store.prune()
+
+
+prune_sessions()
+
+# Session id lives in the URL so a browser refresh finds the same on-disk carts/PDFs.
+# Anything that isn't a uuid4 hex (e.g. a crafted path) gets a fresh id instead.
+if "sid" not in st.session_state:
+    sid = st.query_params.get("sid")
+    st.session_state.sid = sid if session_store.valid_sid(sid) else session_store.new_sid()
+    st.query_params["sid"] = st.session_state.sid
+SID = st.session_state.sid
+
 materials = get_materials()
 locations = get_locations()
+has_materials = len(materials) > 0
+has_locations = len(locations) > 0
 
 # Safety checks
-if materials.empty:
+if not has_materials:
     st.error("MaterialMaster is empty. Check MaterialMaster.csv and db load step.")
     st.stop()
 
-if locations.empty:
+if not has_locations:
     st.error("Locations table is empty.")
     st.stop()
 
+# O(1) lookups for selectbox labels and cart lines (no per-option DataFrame scans)
+MAT_IDX = dict(zip(materials["MaterialID"], zip(materials["MaterialCode"], materials["MaterialName"])))
+LOC_CODE = dict(zip(locations["LocationID"], locations["LocationCode"]))
+materials["__label"] = materials["MaterialCode"].astype(str) + " - " + materials["MaterialName"].astype(str)
+MAT_LABEL = dict(zip(materials["MaterialID"], materials["__label"]))
+# Plain-list selectbox options (Python ints): no Series iteration per render
+MAT_IDS = materials["MaterialID"].tolist()
+LOC_IDS = locations["LocationID"].tolist()
+
+# ---------------- CART HELPERS ----------------
+# Carts are stored column-wise (dict of lists) so the DataFrame view needs no per-row dict parsing
+CART_COLS = ["MaterialID", "MaterialCode", "MaterialName", "LocationID", "LocationCode", "Lot", "Qty", "UOM", "Notes"]
+CART_VIEW_COLS = ["MaterialCode", "MaterialName", "LocationCode", "Lot", "Qty", "UOM", "Notes"]
+
+
+def init_cart(key: str):
+    if key not in st.session_state:
+        cart = session_store.load(SID, key)
+        if not isinstance(cart, dict) or any(c not in cart for c in CART_COLS):
+            cart = {c: [] for c in CART_COLS}
+        st.session_state[key] = cart
+        st.session_state[f"{key}_version"] = 0
+
+
+def cart_len(key: str) -> int:
+    return len(st.session_state[key]["MaterialID"])
+
+
+def cart_add(key: str, line: dict):
+    cart = st.session_state[key]
+    for c in CART_COLS:
+        cart[c].append(line[c])
+    st.session_state[f"{key}_version"] += 1
+    session_store.save(SID, key, cart)
+
+
+def cart_clear(key: str):
+    st.session_state[key] = {c: [] for c in CART_COLS}
+    st.session_state[f"{key}_version"] += 1
+    session_store.delete(SID, key)
+
+
+def cart_frame(key: str, view: bool = False) -> pd.DataFrame:
+    """DataFrame of a cart (or its display projection), rebuilt only when the cart version changes."""
+    version = st.session_state[f"{key}_version"]
+    cached = st.session_state.get(f"{key}_df")
+    if cached is None or cached[0] != version:
+        df = pd.DataFrame(st.session_state[key], columns=CART_COLS)
+        cached = (version, df, df[CART_VIEW_COLS])
+        st.session_state[f"{key}_df"] = cached
+    return cached[2] if view else cached[1]
+
+
+def cart_txn_rows(key: str, txn_type: str, sign: float, header_notes: str) -> list[tuple]:
+    """Ledger rows for the whole cart, built column-wise (blank line notes fall back to the header notes)."""
+    df = cart_frame(key)
+    notes = df["Notes"].mask(df["Notes"] == "", header_notes).str.strip()
+    qty = df["Qty"].astype("float64") * sign
+    return list(zip(
+        df["MaterialID"].tolist(),
+        df["LocationID"].tolist(),
+        df["Lot"].tolist(),
+        [txn_type] * len(df),
+        qty.tolist(),
+        df["UOM"].tolist(),
+        notes.tolist(),
+    ))
+
+
+def render_cart(key: str):
+    # The frame only rebuilds on a new cart_version
+    st.dataframe(cart_frame(key, view=True), width="stretch", hide_index=True)
+
+
+def write_pdf(kind: str, posted_at: datetime, **kwargs) -> bool:
+    """
+    Render straight into the session dir; only the path is kept in memory.
+    A failed build is reported and the PDF slot cleared (the posted lines stay posted).
+    """
+    path = session_store.blob_path(SID, f"last_{kind}_pdf", ".pdf")
+    try:
+        generate_multi_issue_pdf(out_path=path, issued_at=posted_at, **kwargs)
+    except Exception as e:
+        st.error(f"Posted, but could not build the {kind} PDF: {e}")
+        clear_last_pdf(kind)
+        return False
+    st.session_state[f"last_{kind}_pdf_path"] = path
+    st.session_state[f"last_{kind}_at"] = posted_at
+    session_store.save(SID, f"last_{kind}_pdf", {"path": path, "at": posted_at.isoformat()})
+    return True
+
+
+def restore_last_pdf(kind: str):
+    """Pick up a PDF posted earlier in this session (e.g. before a refresh)."""
+    meta = session_store.load(SID, f"last_{kind}_pdf")
+    # The path is rebuilt from the session id, never taken from the stored JSON
+    path = session_store.blob_path(SID, f"last_{kind}_pdf", ".pdf")
+    if meta and Path(path).exists():
+        st.session_state[f"last_{kind}_pdf_path"] = path
+        st.session_state[f"last_{kind}_at"] = datetime.fromisoformat(meta["at"])
+    else:
+        st.session_state[f"last_{kind}_pdf_path"] = None
+        st.session_state[f"last_{kind}_at"] = None
+
+
+def clear_last_pdf(kind: str):
+    session_store.delete(SID, f"last_{kind}_pdf", session_store.blob_path(SID, f"last_{kind}_pdf", ".pdf"))
+    st.session_state[f"last_{kind}_pdf_path"] = None
+    st.session_state[f"last_{kind}_at"] = None
+
+
+def pdf_result(kind: str) -> bytes | None:
+    """Bytes of the last posted PDF; a missing file is reported once and dropped, so the tab keeps working."""
+    try:
+        return Path(st.session_state[f"last_{kind}_pdf_path"]).read_bytes()
+    except OSError as e:
+        st.error(f"Could not read the {kind} PDF: {e}")
+        clear_last_pdf(kind)
+        return None
+
+
 tab1, tab2, tab3 = st.tabs(["Receive Material", "Issue Material", "On-Hand"])
 
 # ---------------- RECEIVE ----------------
 with tab1:
     st.subheader("Receive Material — Multiple Materials")
 
-    if "receipt_cart" not in st.session_state:
-        st.session_state.receipt_cart = []
-
-    if "last_receipt_pdf" not in st.session_state:
-        st.session_state.last_receipt_pdf = None
-    if "last_receipt_pdf_name" not in st.session_state:
-        st.session_state.last_receipt_pdf_name = ""
-
-    mat_r = st.selectbox(
-        "Material",
-        materials["MaterialID"],
-        key="rcv_mat",
-        format_func=lambda x:
-            f"{materials.loc[materials.MaterialID==x,'MaterialCode'].values[0]} - "
-            f"{materials.loc[materials.MaterialID==x,'MaterialName'].values[0]}"
-    )
+    init_cart("receipt_cart")
 
-    loc_r = st.selectbox(
-        "Location",
-        locations["LocationID"],
-        key="rcv_loc",
-        format_func=lambda x:
-            locations.loc[locations.LocationID==x, "LocationCode"].values[0]
-    )
+    # Last posted PDF (a path in the session dir, restored after a refresh) and its timestamp
+    if "last_receipt_pdf_path" not in st.session_state:
+        restore_last_pdf("receipt")
+
+    # Form: typing in the entry fields doesn't rerun the page until "Add line" is pressed
+    with st.form("rcv_form", clear_on_submit=False):
+        mat_r = st.selectbox(
+            "Material",
+            MAT_IDS,
+            key="rcv_mat",
+            format_func=MAT_LABEL.get
+        )
+
+        loc_r = st.selectbox(
+            "Location",
+            LOC_IDS,
+            key="rcv_loc",
+            format_func=LOC_CODE.get
+        )
 
-    lot_r = st.text_input("Lot / Batch # (optional)", key="rcv_lot", value="")
-    qty_r = st.number_input("Quantity Received (positive)", key="rcv_qty", min_value=0.0, step=1.0, format="%.4f")
-    uom_r = st.selectbox("UOM", ["LB", "KG", "GAL", "EA"], key="rcv_uom")
-    notes_r = st.text_area("Line notes (optional)", key="rcv_notes", value="")
-
-    colA, colB = st.columns([1, 1])
-    with colA:
-        if st.button("➕ Add line to receive list"):
-            if qty_r <= 0:
-                st.error("Quantity must be greater than 0.")
-            else:
-                material_code = materials.loc[materials.MaterialID == mat_r, "MaterialCode"].values[0]
-                material_name = materials.loc[materials.MaterialID == mat_r, "MaterialName"].values[0]
-                location_code = locations.loc[locations.LocationID == loc_r, "LocationCode"].values[0]
-
-                st.session_state.receipt_cart.append({
-                    "MaterialID": mat_r,
-                    "MaterialCode": material_code,
-                    "MaterialName": material_name,
-                    "LocationID": loc_r,
-                    "LocationCode": location_code,
-                    "Lot": lot_r.strip(),
-                    "Qty": float(qty_r),
-                    "UOM": uom_r,
-                    "Notes": notes_r.strip(),
-                })
-                st.success(f"Added: {material_code} ({qty_r} {uom_r})")
-
-    with colB:
-        if st.button("🧹 Clear receive list"):
-            st.session_state.receipt_cart = []
-            st.rerun()
+        lot_r = st.text_input("Lot / Batch # (optional)", key="rcv_lot", value="")
+        qty_r = st.number_input("Quantity Received (positive)", key="rcv_qty", min_value=0.0, step=1.0, format="%.4f")
+        uom_r = st.selectbox("UOM", ["LB", "KG", "GAL", "EA"], key="rcv_uom")
+        notes_r = st.text_area("Line notes (optional)", key="rcv_notes", value="")
+
+        rcv_submitted = st.form_submit_button("➕ Add line to receive list")
+
+    if rcv_submitted:
+        if qty_r <= 0:
+            st.error("Quantity must be greater than 0.")
+        else:
+            material_code, material_name = MAT_IDX[mat_r]
+            location_code = LOC_CODE[loc_r]
+
+            cart_add("receipt_cart", {
+                "MaterialID": mat_r,
+                "MaterialCode": material_code,
+                "MaterialName": material_name,
+                "LocationID": loc_r,
+                "LocationCode": location_code,
+                "Lot": lot_r.strip(),
+                "Qty": float(qty_r),
+                "UOM": uom_r,
+                "Notes": notes_r.strip(),
+            })
+            st.success(f"Added: {material_code} ({qty_r} {uom_r})")
+
+    if st.button("🧹 Clear receive list"):
+        cart_clear("receipt_cart")
+        st.rerun()
 
     st.divider()
 
     st.subheader("Receive list (will post all lines)")
-    if len(st.session_state.receipt_cart) == 0:
+    if cart_len("receipt_cart") == 0:
         st.info("No lines added yet. Add materials above.")
     else:
-        df_rcv = pd.DataFrame(st.session_state.receipt_cart)[
-            ["MaterialCode", "MaterialName", "LocationCode", "Lot", "Qty", "UOM", "Notes"]
-        ]
-        st.dataframe(df_rcv, width="stretch", hide_index=True)
+        render_cart("receipt_cart")
 
         received_by = st.text_input("Received By (name)", key="rcv_by", value="")
         header_notes = st.text_area("Header notes (optional)", key="rcv_header_notes", value="")
 
         if st.button("Post Receipt (ALL lines)", type="primary"):
-            if len(st.session_state.receipt_cart) == 0:
+            if cart_len("receipt_cart") == 0:
                 st.error("Nothing to post.")
                 st.stop()
 
-            for line in st.session_state.receipt_cart:
-                add_txn(
-                    line["MaterialID"],
-                    line["LocationID"],
-                    line["Lot"],
-                    "RECEIPT",
-                    float(line["Qty"]),
-                    line["UOM"],
-                    (line["Notes"] or header_notes).strip()
-                )
-
-            pdf_buf = generate_multi_issue_pdf(
-                lines=st.session_state.receipt_cart,
-                issued_by=received_by.strip() or "Unknown",
-                header_notes=header_notes.strip(),
-                issued_at=datetime.now(),
-            )
-
-            st.session_state.last_receipt_pdf = pdf_buf.getvalue()
-            st.session_state.last_receipt_pdf_name = f"manual_receipt_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            lines_for_pdf = cart_frame("receipt_cart").to_dict("records")
+            posted_at = datetime.now()
 
-            st.success(f"Posted {len(st.session_state.receipt_cart)} receipt line(s). PDF ready below.")
+            # All lines in one transaction
+            add_txns(cart_txn_rows("receipt_cart", "RECEIPT", 1.0, header_notes))
 
-            st.session_state.receipt_cart = []
-            st.rerun()
+            cart_clear("receipt_cart")
+            if write_pdf(
+                "receipt",
+                posted_at,
+                lines=lines_for_pdf,
+                issued_by=received_by.strip() or "Unknown",
+                header_notes=header_notes.strip(),
+            ):
+                st.success(f"Posted {len(lines_for_pdf)} receipt line(s). PDF ready below.")
+                st.rerun()
 
-    if st.session_state.last_receipt_pdf:
+    if st.session_state.last_receipt_pdf_path is not None:
         st.divider()
         st.subheader("Last posted receipt PDF")
-        st.download_button(
-            label="📄 Download Receipt Record (PDF)",
-            data=st.session_state.last_receipt_pdf,
-            file_name=st.session_state.last_receipt_pdf_name or "manual_receipt.pdf",
-            mime="application/pdf",
-            use_container_width=True,
-        )
-        if st.button("Clear last receipt PDF"):
-            st.session_state.last_receipt_pdf = None
-            st.session_state.last_receipt_pdf_name = ""
-            st.rerun()
+        receipt_at = st.session_state.last_receipt_at
+        receipt_pdf = pdf_result("receipt")
+        if receipt_pdf is not None:
+            st.download_button(
+                label="📄 Download Receipt Record (PDF)",
+                data=receipt_pdf,
+                file_name=f"manual_receipt_{receipt_at:%Y%m%d_%H%M%S}.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+            )
+            if st.button("Clear last receipt PDF"):
+                clear_last_pdf("receipt")
+                st.rerun()
 
 
 # ---------------- ISSUE ----------------
 with tab2:
     st.subheader("Issue Material (Manual) — Multiple Materials")
 
-    if "issue_cart" not in st.session_state:
-        st.session_state.issue_cart = []
-
-    if "last_issue_pdf" not in st.session_state:
-        st.session_state.last_issue_pdf = None
-    if "last_issue_pdf_name" not in st.session_state:
-        st.session_state.last_issue_pdf_name = ""
-
-    mat2 = st.selectbox(
-        "Material",
-        materials["MaterialID"],
-        key="issue_mat",
-        format_func=lambda x:
-            f"{materials.loc[materials.MaterialID==x,'MaterialCode'].values[0]} - "
-            f"{materials.loc[materials.MaterialID==x,'MaterialName'].values[0]}"
-    )
+    init_cart("issue_cart")
 
-    loc2 = st.selectbox(
-        "Location",
-        locations["LocationID"],
-        key="issue_loc",
-        format_func=lambda x:
-            locations.loc[locations.LocationID==x, "LocationCode"].values[0]
-    )
+    # Last posted PDF (a path in the session dir, restored after a refresh) and its timestamp
+    if "last_issue_pdf_path" not in st.session_state:
+        restore_last_pdf("issue")
+
+    # Form: typing in the entry fields doesn't rerun the page until "Add line" is pressed
+    with st.form("issue_form", clear_on_submit=False):
+        mat2 = st.selectbox(
+            "Material",
+            MAT_IDS,
+            key="issue_mat",
+            format_func=MAT_LABEL.get
+        )
+
+        loc2 = st.selectbox(
+            "Location",
+            LOC_IDS,
+            key="issue_loc",
+            format_func=LOC_CODE.get
+        )
 
-    lot2 = st.text_input("Lot / Batch # (optional)", key="issue_lot", value="")
-    qty2 = st.number_input("Quantity Issued (positive)", key="issue_qty", min_value=0.0, step=1.0, format="%.4f")
-    uom2 = st.selectbox("UOM", ["LB", "KG", "GAL", "EA"], key="issue_uom")
-    notes2 = st.text_area("Line notes (optional)", key="issue_notes", value="")
-
-    colA, colB = st.columns([1, 1])
-    with colA:
-        if st.button("➕ Add line to issue list"):
-            if qty2 <= 0:
-                st.error("Quantity must be greater than 0.")
-            else:
-                material_code = materials.loc[materials.MaterialID == mat2, "MaterialCode"].values[0]
-                material_name = materials.loc[materials.MaterialID == mat2, "MaterialName"].values[0]
-                location_code = locations.loc[locations.LocationID == loc2, "LocationCode"].values[0]
-
-                st.session_state.issue_cart.append({
-                    "MaterialID": mat2,
-                    "MaterialCode": material_code,
-                    "MaterialName": material_name,
-                    "LocationID": loc2,
-                    "LocationCode": location_code,
-                    "Lot": lot2.strip(),
-                    "Qty": float(qty2),
-                    "UOM": uom2,
-                    "Notes": notes2.strip(),
-                })
-                st.success(f"Added: {material_code} ({qty2} {uom2})")
-
-    with colB:
-        if st.button("🧹 Clear list"):
-            st.session_state.issue_cart = []
-            st.rerun()
+        lot2 = st.text_input("Lot / Batch # (optional)", key="issue_lot", value="")
+        qty2 = st.number_input("Quantity Issued (positive)", key="issue_qty", min_value=0.0, step=1.0, format="%.4f")
+        uom2 = st.selectbox("UOM", ["LB", "KG", "GAL", "EA"], key="issue_uom")
+        notes2 = st.text_area("Line notes (optional)", key="issue_notes", value="")
+
+        issue_submitted = st.form_submit_button("➕ Add line to issue list")
+
+    if issue_submitted:
+        if qty2 <= 0:
+            st.error("Quantity must be greater than 0.")
+        else:
+            material_code, material_name = MAT_IDX[mat2]
+            location_code = LOC_CODE[loc2]
+
+            cart_add("issue_cart", {
+                "MaterialID": mat2,
+                "MaterialCode": material_code,
+                "MaterialName": material_name,
+                "LocationID": loc2,
+                "LocationCode": location_code,
+                "Lot": lot2.strip(),
+                "Qty": float(qty2),
+                "UOM": uom2,
+                "Notes": notes2.strip(),
+            })
+            st.success(f"Added: {material_code} ({qty2} {uom2})")
+
+    if st.button("🧹 Clear list"):
+        cart_clear("issue_cart")
+        st.rerun()
 
     st.divider()
 
     st.subheader("Issue list (will post all lines)")
-    if len(st.session_state.issue_cart) == 0:
+    if cart_len("issue_cart") == 0:
         st.info("No lines added yet. Add materials above.")
     else:
-        df_cart = pd.DataFrame(st.session_state.issue_cart)[
-            ["MaterialCode", "MaterialName", "LocationCode", "Lot", "Qty", "UOM", "Notes"]
-        ]
-        st.dataframe(df_cart, width="stretch", hide_index=True)
+        render_cart("issue_cart")
 
         issued_by = st.text_input("Issued By (name)", key="issue_by", value="")
         header_notes = st.text_area("Header notes (optional)", key="issue_header_notes", value="")
 
         if st.button("Post Issue (ALL lines)", type="primary"):
-            if len(st.session_state.issue_cart) == 0:
+            if cart_len("issue_cart") == 0:
                 st.error("Nothing to post.")
                 st.stop()
 
-            lines_for_pdf = list(st.session_state.issue_cart)
+            lines_for_pdf = cart_frame("issue_cart").to_dict("records")
+            posted_at = datetime.now()
 
-            for line in lines_for_pdf:
-                add_txn(
-                    line["MaterialID"],
-                    line["LocationID"],
-                    line["Lot"],
-                    "ISSUE",
-                    float(-line["Qty"]),
-                    line["UOM"],
-                    (line["Notes"] or header_notes).strip()
-                )
+            # All lines in one transaction
+            add_txns(cart_txn_rows("issue_cart", "ISSUE", -1.0, header_notes))
 
-            pdf_buf = generate_multi_issue_pdf(
+            cart_clear("issue_cart")
+            if write_pdf(
+                "issue",
+                posted_at,
                 lines=lines_for_pdf,
                 issued_by=issued_by.strip() or "Unknown",
                 header_notes=header_notes.strip(),
-                issued_at=datetime.now(),
-            )
-
-            st.session_state.last_issue_pdf = pdf_buf.getvalue()
-            st.session_state.last_issue_pdf_name = f"manual_issue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-
-            st.success(f"Posted {len(lines_for_pdf)} issue line(s). PDF ready below.")
-
-            st.session_state.issue_cart = []
-            st.rerun()
+            ):
+                st.success(f"Posted {len(lines_for_pdf)} issue line(s). PDF ready below.")
+                st.rerun()
 
-    if st.session_state.last_issue_pdf:
+    if st.session_state.last_issue_pdf_path is not None:
         st.divider()
         st.subheader("Last posted issue PDF")
-        st.download_button(
-            label="📄 Download Issue Record (PDF)",
-            data=st.session_state.last_issue_pdf,
-            file_name=st.session_state.last_issue_pdf_name or "manual_issue.pdf",
-            mime="application/pdf",
-            use_container_width=True,
-        )
-        if st.button("Clear last Issue PDF"):
-            st.session_state.last_issue_pdf = None
-            st.session_state.last_issue_pdf_name = ""
-            st.rerun()
+        issue_at = st.session_state.last_issue_at
+        issue_pdf = pdf_result("issue")
+        if issue_pdf is not None:
+            st.download_button(
+                label="📄 Download Issue Record (PDF)",
+                data=issue_pdf,
+                file_name=f"manual_issue_{issue_at:%Y%m%d_%H%M%S}.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+            )
+            if st.button("Clear last Issue PDF"):
+                clear_last_pdf("issue")
+                st.rerun()
 
 
 # ---------------- ON HAND ----------------
-with tab3:
+@st.fragment
+def render_onhand():
+    # Fragment: paging reruns only this report, not the Receive/Issue tabs
     st.subheader("On-Hand Report")
 
+    # st.tabs renders every tab on each rerun; without this gate every cart Add/Post
+    # would also load the report and encode its CSV
+    if not st.checkbox("Show on-hand report", key="onhand_show"):
+        return
+
     onhand = get_on_hand()
 
-    st.dataframe(onhand, use_container_width=True, hide_index=True)
-    st.caption("On-hand = SUM of all receipts/issues (ledger method).")
+    # Show one page at a time; the full (cached) result still feeds the CSV export
+    page_size = 200
+    n_pages = max(1, -(-len(onhand) // page_size))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key="onhand_page")
+    start = (int(page) - 1) * page_size
+
+    st.dataframe(onhand.iloc[start:start + page_size], use_container_width=True, hide_index=True)
+    if n_pages > 1:
+        st.caption(f"Rows {start + 1}–{min(start + page_size, len(onhand))} of {len(onhand)}")
+    st.caption("On-hand = running balance per material/location/UOM, updated with every posted receipt/issue.")
 
     # --- End-of-day export ---
     csv_bytes = onhand.to_csv(index=False).encode("utf-8")
@@ -297,25 +422,5 @@ with tab3:
     )
 
 
-   
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+with tab3:
+    render_onhand()
@@ -1,15 +1,36 @@
 # pages/new_batch.py
 import os
+import sys
 from io import BytesIO
 from datetime import datetime
+from pathlib import Path
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 
+try:  # optional: Arrow's native CSV reader; pandas' C parser is the fallback
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+# Arrow-backed result columns when pyarrow is present (st.dataframe then skips the object->Arrow pass)
+_STR_DTYPE = "string[pyarrow]" if pa_csv is not None else "string"
+_F64_DTYPE = "float64[pyarrow]" if pa_csv is not None else "float64"
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle
+
+# Ensure repo root on path
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from file_utils import file_stamp
 
 
 st.title("New Batch (Manual) — AWLMIX")
@@ -18,12 +39,43 @@ st.title("New Batch (Manual) — AWLMIX")
 # =========================
 # Helpers: file loaders
 # =========================
+def _read_csv_fast(path: str, names: list[str] | None = None) -> pd.DataFrame:
+    """
+    Quoted CSV/TXT -> DataFrame. names given = headerless file.
+    With pyarrow: multithreaded parse and string columns trimmed by Arrow kernels
+    before conversion; otherwise pandas' C engine.
+    """
+    if pa_csv is not None:
+        try:
+            tbl = pa_csv.read_csv(
+                path,
+                read_options=pa_csv.ReadOptions(column_names=names) if names else None,
+                parse_options=pa_csv.ParseOptions(quote_char='"'),
+            )
+        except (pa.ArrowInvalid, OSError):
+            pass
+        else:
+            cols = [pc.utf8_trim_whitespace(c) if pa.types.is_string(c.type) else c for c in tbl.columns]
+            return pa.table(cols, names=tbl.column_names).to_pandas()
+
+    return pd.read_csv(path, header=None if names else "infer", names=names, quotechar='"', skipinitialspace=True)
+
+
+def _clean_strings(df: pd.DataFrame, cols: list[str] | None = None) -> pd.DataFrame:
+    """Strip quotes/whitespace from the given columns (default: all object columns) in one pass."""
+    if cols is None:
+        cols = df.select_dtypes(include="object").columns.tolist()
+    if cols:
+        df[cols] = df[cols].astype(str).apply(lambda s: s.str.replace('"', "", regex=False).str.strip())
+    return df
+
+
 @st.cache_data
-def load_materials_csv(path: str = "MaterialMaster.csv") -> pd.DataFrame:
+def _load_materials_csv(path: str, stamp: tuple[int, int] | None) -> pd.DataFrame:
     if not os.path.exists(path):
         return pd.DataFrame(columns=["MaterialCode", "MaterialName"])
 
-    df = pd.read_csv(path)
+    df = _read_csv_fast(path)
     df.columns = [c.strip() for c in df.columns]
 
     if "MaterialCode" not in df.columns or "MaterialName" not in df.columns:
@@ -35,41 +87,43 @@ def load_materials_csv(path: str = "MaterialMaster.csv") -> pd.DataFrame:
     return df.sort_values("MaterialCode").reset_index(drop=True)
 
 
+def load_materials_csv(path: str = "MaterialMaster.csv") -> pd.DataFrame:
+    return _load_materials_csv(path, file_stamp(path))
+
+
 @st.cache_data
-def load_ref_txt(path: str, cols: list[str]) -> pd.DataFrame:
+def _load_ref_txt(path: str, cols: list[str], stamp: tuple[int, int] | None) -> pd.DataFrame:
     if not os.path.exists(path):
         return pd.DataFrame(columns=cols)
 
-    df = pd.read_csv(path, header=None, names=cols, quotechar='"', skipinitialspace=True)
-    # Clean strings
-    for c in df.columns:
-        if df[c].dtype == object:
-            df[c] = df[c].astype(str).str.replace('"', "", regex=False).str.strip()
-    return df
+    df = _read_csv_fast(path, names=cols)
+    return _clean_strings(df)
+
+
+def load_ref_txt(path: str, cols: list[str]) -> pd.DataFrame:
+    return _load_ref_txt(path, cols, file_stamp(path))
 
 
 @st.cache_data
-def load_product_weight_targets(path: str = "ProductWeightTargets.txt") -> pd.DataFrame:
+def _load_product_weight_targets(path: str, stamp: tuple[int, int] | None) -> pd.DataFrame:
     # RowID, ProductID, "UnitType", TargetWeightLB, TargetWeightG
     if not os.path.exists(path):
         return pd.DataFrame(columns=["RowID", "ProductID", "UnitType", "TargetWeightLB", "TargetWeightG"])
 
-    df = pd.read_csv(
-        path,
-        header=None,
-        names=["RowID", "ProductID", "UnitType", "TargetWeightLB", "TargetWeightG"],
-        quotechar='"',
-        skipinitialspace=True,
-    )
+    df = _read_csv_fast(path, names=["RowID", "ProductID", "UnitType", "TargetWeightLB", "TargetWeightG"])
     df["ProductID"] = pd.to_numeric(df["ProductID"], errors="coerce")
-    df["UnitType"] = df["UnitType"].astype(str).str.replace('"', "", regex=False).str.strip()
+    df = _clean_strings(df, ["UnitType"])
     df["TargetWeightLB"] = pd.to_numeric(df["TargetWeightLB"], errors="coerce")
     df["TargetWeightG"] = pd.to_numeric(df["TargetWeightG"], errors="coerce")
     return df.dropna(subset=["ProductID", "UnitType"]).reset_index(drop=True)
 
 
+def load_product_weight_targets(path: str = "ProductWeightTargets.txt") -> pd.DataFrame:
+    return _load_product_weight_targets(path, file_stamp(path))
+
+
 @st.cache_data
-def load_packaging_master(path: str = "PackagingMaster.txt") -> pd.DataFrame:
+def _load_packaging_master(path: str, stamp: tuple[int, int] | None) -> pd.DataFrame:
     """
     Expected format (no header):
     RowID, ProductID, "LabelUPC", "CaseUPC", "PackDescription", "PackageCode"
@@ -77,21 +131,21 @@ def load_packaging_master(path: str = "PackagingMaster.txt") -> pd.DataFrame:
     if not os.path.exists(path):
         return pd.DataFrame(columns=["RowID", "ProductID", "LabelUPC", "CaseUPC", "PackDescription", "PackageCode"])
 
-    df = pd.read_csv(
-        path,
-        header=None,
-        names=["RowID", "ProductID", "LabelUPC", "CaseUPC", "PackDescription", "PackageCode"],
-        quotechar='"',
-        skipinitialspace=True,
-    )
+    df = _read_csv_fast(path, names=["RowID", "ProductID", "LabelUPC", "CaseUPC", "PackDescription", "PackageCode"])
     df["ProductID"] = pd.to_numeric(df["ProductID"], errors="coerce")
-    for c in ["LabelUPC", "CaseUPC", "PackDescription", "PackageCode"]:
-        df[c] = df[c].astype(str).str.replace('"', "", regex=False).str.strip()
+    df = _clean_strings(df, ["LabelUPC", "CaseUPC", "PackDescription", "PackageCode"])
     return df.dropna(subset=["ProductID"]).reset_index(drop=True)
 
 
+def load_packaging_master(path: str = "PackagingMaster.txt") -> pd.DataFrame:
+    return _load_packaging_master(path, file_stamp(path))
+
+
+_REF_FILES = ("ProductMaster.txt", "ProductMaterialUsage.txt", "ProductUnits.txt", "MaterialMaster.txt")
+
+
 @st.cache_data
-def load_reference_tables() -> dict[str, pd.DataFrame]:
+def _load_reference_tables(stamps: tuple) -> dict[str, pd.DataFrame]:
     """
     ProductMaterialUsage is advisory only.
     """
@@ -121,37 +175,73 @@ def load_reference_tables() -> dict[str, pd.DataFrame]:
         ref["material_master_ref"]["MaterialCode"] = ref["material_master_ref"]["MaterialCode"].astype(str).str.strip()
         ref["material_master_ref"]["MaterialName"] = ref["material_master_ref"]["MaterialName"].astype(str).str.strip()
 
+    ref["bom_by_pid"] = _index_reference_boms(ref["usage"], ref["material_master_ref"])
+
+    # Sorted unit options per product, so the sidebar doesn't filter/strip ProductUnits per rerun
+    units = ref["units"].dropna(subset=["ProductID", "UnitType"])
+    ref["units_by_pid"] = {int(pid): tuple(sorted(set(u))) for pid, u in units.groupby("ProductID")["UnitType"]}
     return ref
 
 
-def build_reference_bom(ref: dict[str, pd.DataFrame], product_id: int) -> pd.DataFrame:
-    usage = ref.get("usage", pd.DataFrame())
-    mat = ref.get("material_master_ref", pd.DataFrame())
+def load_reference_tables() -> dict[str, pd.DataFrame]:
+    # Key on every source file's stamp so editing any one rebuilds the merged tables
+    return _load_reference_tables(tuple(file_stamp(p) for p in _REF_FILES))
 
+
+_BOM_COLS = ["MaterialCode", "MaterialName", "RefPercent"]
+_EMPTY_BOM = pd.DataFrame(columns=_BOM_COLS)
+
+
+def _index_reference_boms(usage: pd.DataFrame, mat: pd.DataFrame) -> dict[int, pd.DataFrame]:
+    """One merge + groupby for all products; BOM lookups are then a dict hit."""
     if usage.empty or mat.empty:
-        return pd.DataFrame(columns=["MaterialCode", "MaterialName", "RefPercent"])
-
-    u = usage.copy()
-    u = u[u["ProductID"] == product_id].copy()
-    if u.empty:
-        return pd.DataFrame(columns=["MaterialCode", "MaterialName", "RefPercent"])
-
-    bom = u.merge(mat, on="MaterialID", how="left")
-    bom["UsageFraction"] = pd.to_numeric(bom["UsageFraction"], errors="coerce").fillna(0.0)
-    bom["RefPercent"] = bom["UsageFraction"] * 100.0
-
-    bom = (
-        bom.groupby(["MaterialCode", "MaterialName"], as_index=False)["RefPercent"]
-        .sum()
-        .sort_values("RefPercent", ascending=False)
-        .reset_index(drop=True)
-    )
-    return bom
+        return {}
+
+    bom = usage.dropna(subset=["ProductID"]).merge(mat, on="MaterialID", how="left")
+    bom["RefPercent"] = bom["UsageFraction"].fillna(0.0) * 100.0
+
+    return {
+        int(pid): (
+            g.groupby(["MaterialCode", "MaterialName"], as_index=False)["RefPercent"]
+            .sum()
+            .sort_values("RefPercent", ascending=False)
+            .reset_index(drop=True)
+        )
+        for pid, g in bom.groupby("ProductID", sort=False)
+    }
+
+
+def build_reference_bom(ref: dict[str, pd.DataFrame], product_id: int) -> pd.DataFrame:
+    # Memoized per product by load_reference_tables; callers treat the frame as read-only
+    return ref.get("bom_by_pid", {}).get(int(product_id), _EMPTY_BOM)
 
 
 # =========================
 # PDF builder
 # =========================
+# Static table styles built once at import; only the row striping depends on the data
+_INGREDIENT_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+])
+
+# Packaging table is always 4 rows: whitesmoke/white striping as concrete fills
+_PACK_STYLE = TableStyle([
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+    ("BACKGROUND", (0, 2), (-1, 2), colors.whitesmoke),
+    ("LEFTPADDING", (0, 0), (-1, -1), 6),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+    ("TOPPADDING", (0, 0), (-1, -1), 6),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+])
+
+
 def build_batch_ticket_pdf(
     df: pd.DataFrame,
     new_total_g: float,
@@ -193,25 +283,25 @@ def build_batch_ticket_pdf(
 
     # Ingredient table
     cols = ["MaterialCode", "MaterialName", "Ratio", "New (g)"]
-    safe = df.copy()
-    for c in cols:
-        if c not in safe.columns:
-            safe[c] = ""
-
-    table_data = [cols] + safe[cols].astype(str).values.tolist()
-    t = Table(table_data, hAlign="LEFT", colWidths=[90, 230, 80, 90])
-    t.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, -1), 9),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
-    ]))
+    missing = {c: "" for c in cols if c not in df.columns}
+    safe = df.assign(**missing) if missing else df
+
+    # Cell text as before (str of each value), converted column-wise; no whole-frame object cast
+    rows = zip(*(safe[c].astype(str) for c in cols))
+    table_data = [cols] + [list(r) for r in rows]
+    # LongTable: fixed widths + incremental row splitting; header repeats on each page
+    t = LongTable(table_data, hAlign="LEFT", colWidths=[90, 230, 80, 90], repeatRows=1, splitByRow=1)
+    t.setStyle(_INGREDIENT_STYLE)
+    # Striping as concrete per-row fills (white rows need none)
+    t.setStyle(TableStyle([("BACKGROUND", (0, i), (-1, i), colors.whitesmoke) for i in range(1, len(table_data), 2)]))
     story.append(t)
     story.append(Spacer(1, 10))
 
-    check_sum = float(pd.to_numeric(safe["New (g)"], errors="coerce").fillna(0).sum())
+    new_g = safe["New (g)"]
+    if pd.api.types.is_numeric_dtype(new_g):
+        check_sum = float(new_g.to_numpy(dtype=np.float64, na_value=0.0).sum())
+    else:
+        check_sum = float(pd.to_numeric(new_g, errors="coerce").fillna(0).sum())
     story.append(Paragraph(f"<b>Check Sum:</b> {check_sum:,.2f} g", styles["Normal"]))
     story.append(Spacer(1, 12))
 
@@ -230,16 +320,7 @@ def build_batch_ticket_pdf(
             hAlign="LEFT",
             colWidths=[140, 300],
         )
-        pack_table.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("ROWBACKGROUNDS", (0, 0), (-1, -1), [colors.whitesmoke, colors.white]),
-            ("LEFTPADDING", (0, 0), (-1, -1), 6),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-            ("TOPPADDING", (0, 0), (-1, -1), 6),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-        ]))
+        pack_table.setStyle(_PACK_STYLE)
         story.append(pack_table)
 
     doc.build(story)
@@ -249,20 +330,50 @@ def build_batch_ticket_pdf(
 # =========================
 # Data: Material dropdown
 # =========================
+@st.cache_data(show_spinner=False)
+def build_material_lookup(stamp: tuple[int, int] | None, _materials: pd.DataFrame) -> tuple[tuple[str, ...], dict[str, str]]:
+    """Dropdown codes (as a tuple) and code -> name, built once per MaterialMaster.csv version."""
+    codes = ("",) + tuple(_materials["MaterialCode"].tolist())
+    return codes, dict(zip(_materials["MaterialCode"], _materials["MaterialName"]))
+
+
 materials = load_materials_csv("MaterialMaster.csv")
 materials_loaded = not materials.empty
-codes_list = [""] + (materials["MaterialCode"].tolist() if materials_loaded else [])
-name_map = dict(zip(materials["MaterialCode"], materials["MaterialName"])) if materials_loaded else {}
+codes_list, name_map = build_material_lookup(file_stamp("MaterialMaster.csv"), materials) if materials_loaded else (("",), {})
 
 
 # =========================
 # Sidebar: Settings + Reference
 # =========================
+@st.cache_data(show_spinner=False)
+def build_product_index(stamp: tuple[int, int] | None, _pm: pd.DataFrame) -> dict:
+    """
+    ProductCode options and ProductCode -> ProductID (built once per file version, keyed on stamp).
+    First row wins on duplicates, matching the previous .iloc[0] picks.
+    """
+    pm_first = _pm.dropna(subset=["ProductCode"]).drop_duplicates("ProductCode")
+    return {
+        "product_codes": sorted(pm_first["ProductCode"].tolist()),
+        "code_to_pid": dict(zip(pm_first["ProductCode"], pm_first["ProductID"].astype(int))),
+    }
+
+
+@st.cache_data(show_spinner=False)
+def build_target_index(stamps: tuple, _wt: pd.DataFrame, _pkg: pd.DataFrame) -> dict:
+    """(ProductID, UnitType) -> target lb/g and ProductID -> packaging records; first row wins."""
+    wt_first = _wt.drop_duplicates(["ProductID", "UnitType"])
+    return {
+        "wt_by_pid_unit": {
+            (int(pid), unit): (lb, g)
+            for pid, unit, lb, g in zip(wt_first["ProductID"], wt_first["UnitType"], wt_first["TargetWeightLB"], wt_first["TargetWeightG"])
+        },
+        "pkg_by_pid": {int(pid): g.to_dict("records") for pid, g in _pkg.groupby("ProductID", sort=False)},
+    }
+
+
 ref = load_reference_tables()
 pm = ref["product_master"]
-pu = ref["units"]
-wt = load_product_weight_targets("ProductWeightTargets.txt")
-pkg = load_packaging_master("PackagingMaster.txt")
+idx = build_product_index(file_stamp("ProductMaster.txt"), pm)
 
 with st.sidebar:
     st.header("Settings")
@@ -282,50 +393,46 @@ with st.sidebar:
     else:
         ref_product_code = st.selectbox(
             "Reference ProductCode",
-            options=[""] + sorted(pm["ProductCode"].dropna().unique().tolist()),
+            options=[""] + idx["product_codes"],
             index=0
         )
 
         if ref_product_code:
-            ref_product_id = int(pd.to_numeric(
-                pm.loc[pm["ProductCode"] == ref_product_code, "ProductID"].iloc[0],
-                errors="coerce"
+            ref_product_id = idx["code_to_pid"][ref_product_code]
+
+            # Weight targets / packaging are only parsed once a reference product is picked
+            wt = load_product_weight_targets("ProductWeightTargets.txt")
+            pkg = load_packaging_master("PackagingMaster.txt")
+            idx.update(build_target_index(
+                (file_stamp("ProductWeightTargets.txt"), file_stamp("PackagingMaster.txt")), wt, pkg
             ))
 
-            unit_options = (
-                pu.loc[pu["ProductID"] == ref_product_id, "UnitType"]
-                .dropna()
-                .astype(str)
-                .str.strip()
-                .unique()
-                .tolist()
-            )
-            selected_unit = st.selectbox("Reference Unit", options=[""] + sorted(unit_options), index=0)
+            unit_options = ref["units_by_pid"].get(ref_product_id, ())
+            selected_unit = st.selectbox("Reference Unit", options=["", *unit_options], index=0)
 
             if selected_unit:
-                wt_row = wt[(wt["ProductID"] == ref_product_id) & (wt["UnitType"] == selected_unit)]
-                if wt_row.empty:
+                wt_hit = idx["wt_by_pid_unit"].get((ref_product_id, selected_unit))
+                if wt_hit is None:
                     st.warning("No target weight found for this Product + Unit.")
                 else:
-                    target_lb = float(wt_row["TargetWeightLB"].iloc[0])
-                    target_g = float(wt_row["TargetWeightG"].iloc[0])
+                    target_lb, target_g = float(wt_hit[0]), float(wt_hit[1])
                     st.caption(f"Target weight: {target_lb:,.4f} lb | {target_g:,.2f} g ({selected_unit})")
 
             # Packaging dropdown (driven by ProductID)
             st.subheader("Packaging (optional)")
             selected_pkg = None
             if not pkg.empty and ref_product_id is not None:
-                pkg_opts = pkg[pkg["ProductID"] == ref_product_id].copy()
-                if pkg_opts.empty:
+                pkg_opts = idx["pkg_by_pid"].get(ref_product_id, [])
+                if not pkg_opts:
                     st.caption("No packaging found for this ProductID.")
                 else:
                     package_code = st.selectbox(
                         "PackageCode",
-                        options=[""] + pkg_opts["PackageCode"].dropna().astype(str).tolist(),
+                        options=[""] + [str(r["PackageCode"]) for r in pkg_opts],
                         index=0
                     )
                     if package_code:
-                        selected_pkg = pkg_opts[pkg_opts["PackageCode"] == package_code].iloc[0].to_dict()
+                        selected_pkg = next(r for r in pkg_opts if str(r["PackageCode"]) == package_code)
                         st.caption(
                             f'Pack: {selected_pkg.get("PackDescription","")} | '
                             f'LabelUPC: {selected_pkg.get("LabelUPC","")} | '
@@ -347,131 +454,136 @@ selected_codes: list[str] = []
 selected_names: list[str] = []
 old_g: list[float] = []
 
-for i in range(int(n)):
-    col_code, col_weight = st.columns([1.3, 1.0])
-
-    with col_code:
-        if materials_loaded:
-            code = st.selectbox(f"MaterialCode {i+1}", options=codes_list, key=f"code_{i}")
-            name = name_map.get(code, "") if code else ""
-            if name:
-                st.caption(f"Name: {name}")
-        else:
-            code = st.text_input(f"MaterialCode {i+1}", placeholder="e.g. OQ8154", key=f"code_{i}").strip()
-            name = ""
-
-    with col_weight:
-        label = f"{code} (g)" if code else f"Ingredient {i+1} (g)"
-        g = st.number_input(label, min_value=0.0, step=1.0, format="%.4f", key=f"g_{i}")
-
-    selected_codes.append(code if code else f"Ingredient {i+1}")
-    selected_names.append(name)
-    old_g.append(float(g))
-
-total_g = float(sum(old_g))
-st.write(f"**RFT total:** {total_g:,.4f} g")
-
-# Default new_total: use target_g if a reference target exists, otherwise use total_g
-default_new_total = float(target_g) if target_g is not None and target_g > 0 else (total_g if total_g > 0 else 0.0)
+# Search-first dropdowns: each row gets at most MAX_CODE_OPTIONS matching codes,
+# not the whole MaterialMaster (n widgets x N options on every rerun).
+MAX_CODE_OPTIONS = 200
+code_options = codes_list
+if materials_loaded:
+    code_filter = st.text_input("Filter material codes", key="code_filter", placeholder="type part of a code").strip().lower()
+    matches = [c for c in codes_list[1:] if code_filter in c.lower()] if code_filter else codes_list[1:]
+    code_options = [""] + matches[:MAX_CODE_OPTIONS]
+    if len(matches) > MAX_CODE_OPTIONS:
+        st.caption(f"Showing {MAX_CODE_OPTIONS} of {len(matches)} codes — type to narrow the list.")
+
+# Form: ingredient edits don't rerun the page; everything is applied on "Calculate batch"
+with st.form("batch_form"):
+    for i in range(int(n)):
+        col_code, col_weight = st.columns([1.3, 1.0])
+
+        with col_code:
+            if materials_loaded:
+                current = st.session_state.get(f"code_{i}", "")
+                options = code_options if current in code_options else [*code_options, current]
+                code = st.selectbox(f"MaterialCode {i+1}", options=options, key=f"code_{i}")
+                name = name_map.get(code, "") if code else ""
+                if name:
+                    st.caption(f"Name: {name}")
+            else:
+                code = st.text_input(f"MaterialCode {i+1}", placeholder="e.g. OQ8154", key=f"code_{i}").strip()
+                name = ""
+
+        with col_weight:
+            label = f"{code} (g)" if code else f"Ingredient {i+1} (g)"
+            g = st.number_input(label, min_value=0.0, step=1.0, format="%.4f", key=f"g_{i}")
+
+        selected_codes.append(code if code else f"Ingredient {i+1}")
+        selected_names.append(name)
+        old_g.append(float(g))
+
+    total_g = float(sum(old_g))
+    st.write(f"**RFT total:** {total_g:,.4f} g")
+
+    # Default new_total: use target_g if a reference target exists, otherwise use total_g
+    default_new_total = float(target_g) if target_g is not None and target_g > 0 else (total_g if total_g > 0 else 0.0)
+
+    new_total = st.number_input(
+        "New batch total (g)",
+        min_value=0.0,
+        value=default_new_total,
+        step=1.0,
+        format="%.4f",
+        key="new_total_g"
+    )
 
-new_total = st.number_input(
-    "New batch total (g)",
-    min_value=0.0,
-    value=default_new_total,
-    step=1.0,
-    format="%.4f",
-    key="new_total_g"
-)
+    calc_submitted = st.form_submit_button("Calculate batch")
 
 
 # =========================
 # Calculate
 # =========================
-def highlight_oos(row, tol: float):
-    oos = abs(float(row["DeltaPercent_num"])) > float(tol)
-    style = "background-color: #ffe6e6; font-weight: 700;" if oos else ""
-    return [style for _ in row.index]
-
-
-if st.button("Calculate batch"):
+if calc_submitted:
     if total_g <= 0:
         st.error("RFT total must be greater than zero.")
         st.stop()
 
-    ratios = [x / total_g for x in old_g]
-    raw = [r * float(new_total) for r in ratios]
+    og = np.fromiter(old_g, dtype=np.float64, count=len(old_g))
+    ratios = og / total_g
+    raw = ratios * float(new_total)
 
     # rounding + drift correction
     if round_step == 0.0:
         final = raw
     else:
-        final = [round(x / round_step) * round_step for x in raw]
-        drift = float(new_total) - float(sum(final))
-        biggest_idx = int(max(range(len(final)), key=lambda k: final[k]))
-        final[biggest_idx] += drift
-
-    st.subheader("New batch results")
+        final = np.round(raw / round_step) * round_step
+        final[int(final.argmax())] += float(new_total) - float(final.sum())
 
     out_df = pd.DataFrame({
-        "MaterialCode": selected_codes,
-        "MaterialName": selected_names,
-        "Ratio": [round(r, 10) for r in ratios],
-        "New (g)": [round(x, 4) for x in final],
+        "MaterialCode": pd.array(selected_codes, dtype=_STR_DTYPE),
+        "MaterialName": pd.array(selected_names, dtype=_STR_DTYPE),
+        "Ratio": pd.array(np.round(ratios, 10), dtype=_F64_DTYPE),
+        "New (g)": pd.array(np.round(final, 4), dtype=_F64_DTYPE),
     })
 
-    st.dataframe(out_df, hide_index=True, use_container_width=True)
-    st.write(f"**Check sum:** {sum(final):,.4f} g")
+    # Results live in session_state so later reruns (e.g. the PDF button) still show them
+    st.session_state["batch_results"] = dict(
+        df=out_df,
+        check_sum=float(final.sum()),
+        bom=build_reference_bom(ref, ref_product_id) if ref_product_id is not None else None,
+    )
 
-    # Reference BOM compare (advisory)
-    if ref_product_id is not None:
-        bom = build_reference_bom(ref, ref_product_id)
+    # Stash the ticket inputs; the PDF itself is only built when asked for
+    st.session_state["ticket_inputs"] = dict(
+        df=out_df,
+        new_total_g=float(new_total),
+        title="AWLMIX Batch Ticket - New Batch",
+        product_code=ref_product_code if ref_product_code else None,
+        unit_type=selected_unit if selected_unit else None,
+        target_lb=target_lb,
+        packaging=selected_pkg if "selected_pkg" in globals() else None,
+    )
+    st.session_state.pop("ticket_pdf", None)
+
+
+# Results (last calculated batch)
+if "batch_results" in st.session_state:
+    results = st.session_state["batch_results"]
 
+    st.subheader("New batch results")
+    st.dataframe(results["df"], hide_index=True, use_container_width=True)
+    st.write(f"**Check sum:** {results['check_sum']:,.4f} g")
+
+    # Reference BOM compare (advisory)
+    bom = results["bom"]
+    if bom is not None:
         st.subheader("Reference BOM (advisory)")
         if bom.empty:
             st.info("Reference BOM not available for this product.")
         else:
             st.dataframe(bom, use_container_width=True)
 
-            manual_df = pd.DataFrame({"MaterialCode": selected_codes, "Manual_g": final})
-            manual_df["Manual_g"] = pd.to_numeric(manual_df["Manual_g"], errors="coerce").fillna(0.0)
-            manual_df = manual_df.groupby("MaterialCode", as_index=False)["Manual_g"].sum()
 
-            manual_total = float(manual_df["Manual_g"].sum()) if not manual_df.empty else 0.0
-            manual_df["ManualPercent"] = (manual_df["Manual_g"] / manual_total * 100.0) if manual_total > 0 else 0.0
+# PDF download (last calculated batch)
+if "ticket_inputs" in st.session_state:
+    if st.button("Prepare Batch Ticket (PDF)"):
+        st.session_state["ticket_pdf"] = build_batch_ticket_pdf(**st.session_state["ticket_inputs"])
 
-            comp = manual_df.merge(bom[["MaterialCode", "RefPercent"]], on="MaterialCode", how="outer")
-            comp["Manual_g"] = pd.to_numeric(comp["Manual_g"], errors="coerce").fillna(0.0)
-            comp["ManualPercent"] = pd.to_numeric(comp["ManualPercent"], errors="coerce").fillna(0.0)
-            comp["RefPercent"] = pd.to_numeric(comp["RefPercent"], errors="coerce").fillna(0.0)
-            comp["DeltaPercent"] = comp["ManualPercent"] - comp["RefPercent"]
-
-            view = comp.sort_values("MaterialCode")[["MaterialCode", "Manual_g", "ManualPercent", "RefPercent", "DeltaPercent"]].copy()
-            view["DeltaPercent_num"] = pd.to_numeric(view["DeltaPercent"], errors="coerce").fillna(0.0)
-
-            view_disp = view.copy()
-            view_disp["Manual_g"] = view_disp["Manual_g"].map(lambda x: f"{x:,.4f}")
-            view_disp["ManualPercent"] = view_disp["ManualPercent"].map(lambda x: f"{x:,.4f}")
-            view_disp["RefPercent"] = view_disp["RefPercent"].map(lambda x: f"{x:,.4f}")
-            view_disp["DeltaPercent"] = view_disp["DeltaPercent_num"].map(lambda x: f"{x:,.4f}")
-
-           
-
-    # PDF download
-    pdf_bytes = build_batch_ticket_pdf(
-        out_df,
-        float(new_total),
-        title="AWLMIX Batch Ticket - New Batch",
-        product_code=ref_product_code if ref_product_code else None,
-        unit_type=selected_unit if selected_unit else None,
-        target_lb=target_lb,
-        packaging=selected_pkg if "selected_pkg" in globals() else None,
-    )
-    st.download_button(
-        "Download Batch Ticket (PDF)",
-        data=pdf_bytes,
-        file_name="AWLMIX_Batch_Ticket_New_Batch.pdf",
-        mime="application/pdf"
-    )
+    if "ticket_pdf" in st.session_state:
+        st.download_button(
+            "Download Batch Ticket (PDF)",
+            data=st.session_state["ticket_pdf"],
+            file_name="AWLMIX_Batch_Ticket_New_Batch.pdf",
+            mime="application/pdf"
+        )
 
 
 
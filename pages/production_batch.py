@@ -1,15 +1,25 @@
+import os
 import streamlit as st
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import sys
 
+try:
+    import pyarrow  # noqa: F401  (enables pandas' Arrow CSV engine and string dtype)
+    _CSV_ENGINE, _STR_DTYPE = "pyarrow", "string[pyarrow]"
+except ImportError:
+    _CSV_ENGINE, _STR_DTYPE = "c", "string"
+
+DEBUG = os.getenv("DEBUG", "0") == "1"
+
 # Ensure repo root on path
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from db import get_conn  # uses your existing SQLite connection
+from db import locked_conn  # shared SQLite connection, serialized across sessions
+from file_utils import file_stamp
 
 
 st.title("Production Batch (Progress)")
@@ -36,28 +46,80 @@ WEIGHT_TARGETS_PATH = ROOT_DIR / "ProductWeightTargets.txt"
 # Load TXT (CSV) files
 # ----------------------------
 @st.cache_data
-def load_product_master(path: Path, mtime: float) -> pd.DataFrame:
-    if not path.exists():
+def load_product_master(path: Path, stamp: tuple[int, int] | None) -> pd.DataFrame:
+    if stamp is None:
         return pd.DataFrame()
-    return pd.read_csv(path)
+    df = pd.read_csv(
+        path,
+        engine=_CSV_ENGINE,
+        dtype={"ProductID": "int64", "ProductCode": _STR_DTYPE, "ProductName": _STR_DTYPE},
+    )
+    # Dropdown label, built once per file version rather than on every rerun
+    df["Display"] = df["ProductCode"].astype("string") + " — " + df["ProductName"].astype("string")
+    return df
 
 @st.cache_data
-def load_weight_targets(path: Path, mtime: float) -> pd.DataFrame:
-    if not path.exists():
+def load_weight_targets(path: Path, stamp: tuple[int, int] | None) -> pd.DataFrame:
+    if stamp is None:
         return pd.DataFrame()
-    return pd.read_csv(path)
-
-pm_mtime = PRODUCT_MASTER_PATH.stat().st_mtime if PRODUCT_MASTER_PATH.exists() else 0
-wt_mtime = WEIGHT_TARGETS_PATH.stat().st_mtime if WEIGHT_TARGETS_PATH.exists() else 0
-
-pm = load_product_master(PRODUCT_MASTER_PATH, pm_mtime)
-wt = load_weight_targets(WEIGHT_TARGETS_PATH, wt_mtime)
-
+    df = pd.read_csv(
+        path,
+        engine=_CSV_ENGINE,
+        dtype={
+            "ProductID": "int64",
+            "UnitType": _STR_DTYPE,
+            "TotalWeightPerUnitLB": "float64",
+            "TotalWeightPerUnitG": "float64",
+        },
+    )
+    # Normalize UnitType once (so GLUS/QTUS behave correctly); categorical
+    # keeps the per-product filters below as integer-code compares.
+    if "UnitType" in df.columns:
+        df["UnitType"] = pd.Categorical(
+            df["UnitType"].astype("string").str.replace('"', '', regex=False).str.strip().str.upper()
+        )
+    return df
 
+pm_stamp = file_stamp(PRODUCT_MASTER_PATH)
+wt_stamp = file_stamp(WEIGHT_TARGETS_PATH)
+
+pm = load_product_master(PRODUCT_MASTER_PATH, pm_stamp)
+wt = load_weight_targets(WEIGHT_TARGETS_PATH, wt_stamp)
+
+
+@st.cache_data(show_spinner=False)
+def build_product_index(stamp: tuple[int, int] | None, _pm: pd.DataFrame) -> dict:
+    """Product dropdown labels and label -> (ProductID, code, name), built once per file version."""
+    by_display = {}
+    for d, pid, code, name in zip(_pm["Display"], _pm["ProductID"], _pm["ProductCode"], _pm["ProductName"]):
+        by_display.setdefault(d, (int(pid), str(code), str(name)))  # first row wins, like .iloc[0]
+    return {"displays": _pm["Display"].tolist(), "by_display": by_display}
+
+
+@st.cache_data(show_spinner=False)
+def build_weight_index(stamp: tuple[int, int] | None, _wt: pd.DataFrame) -> dict:
+    """
+    ProductID -> {UnitType: (lb per unit, g per unit)} (first row wins on duplicates)
+    and ProductID -> sorted UnitType options for the selectbox.
+    """
+    wt_first = _wt.dropna(subset=["UnitType"]).drop_duplicates(["ProductID", "UnitType"])
+    idx = {}
+    for pid, unit, lb, g in zip(
+        wt_first["ProductID"], wt_first["UnitType"],
+        wt_first["TotalWeightPerUnitLB"], wt_first["TotalWeightPerUnitG"],
+    ):
+        idx.setdefault(int(pid), {})[unit] = (float(lb or 0.0), float(g or 0.0))
+    return {
+        "targets": idx,
+        "unit_options": {pid: sorted(units) for pid, units in idx.items()},
+    }
+
+
+@st.cache_resource
 def ensure_production_batch_table():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
+    """Schema check once per server process (the shared connection stays open across reruns)."""
+    with locked_conn() as conn, conn:
+        conn.execute("""
     CREATE TABLE IF NOT EXISTS ProductionBatch (
         BatchID INTEGER PRIMARY KEY AUTOINCREMENT,
         BatchNumber TEXT UNIQUE,
@@ -79,64 +141,59 @@ def ensure_production_batch_table():
         UpdatedBy TEXT
     );
     """)
-    conn.commit()
-    conn.close()
+        # Recent-batches list walks this index backwards and stops at LIMIT
+        # instead of scanning + sorting the whole table.
+        conn.execute("""
+    CREATE INDEX IF NOT EXISTS ix_pb_updatedat
+    ON ProductionBatch(UpdatedAt DESC);
+    """)
+    with locked_conn() as conn:
+        conn.execute("ANALYZE ProductionBatch;")
+    return True
+
+
+# ----------------------------
+# SQL (fixed text so sqlite3's statement cache reuses the prepared statements)
+# ----------------------------
+_BATCH_INSERT_COLS = (
+    "BatchNumber", "ProductID", "ProductCode", "ProductName", "UnitType",
+    "QtyUnits", "TargetPerUnitLB", "TargetPerUnitG", "TotalTargetLB", "TotalTargetG",
+    "Status", "Customer", "Notes", "CreatedAt", "CreatedBy", "UpdatedAt", "UpdatedBy",
+)
+
+_SQL_INSERT_BATCH = (
+    f"INSERT INTO ProductionBatch ({', '.join(_BATCH_INSERT_COLS)}) "
+    f"VALUES ({', '.join('?' * len(_BATCH_INSERT_COLS))})"
+)
+
+_SQL_UPDATE_STATUS = """
+    UPDATE ProductionBatch
+    SET Status = ?, UpdatedAt = ?, UpdatedBy = ?
+    WHERE BatchID = ?
+"""
+
+# Only what the progress view and the table show (BatchID for lookups)
+_SQL_RECENT_BATCHES = """
+    SELECT
+        BatchID, BatchNumber, ProductCode, ProductName, UnitType,
+        QtyUnits, Status, UpdatedAt, UpdatedBy
+    FROM ProductionBatch
+    ORDER BY UpdatedAt DESC
+    LIMIT ?
+"""
 
 
 def insert_batch(record: dict):
-    conn = get_conn()
-    conn.execute("""
-        INSERT INTO ProductionBatch
-        (BatchNumber, ProductID, ProductCode, ProductName, UnitType,
-         QtyUnits, TargetPerUnitLB, TargetPerUnitG, TotalTargetLB, TotalTargetG,
-         Status, Customer, Notes, CreatedAt, CreatedBy, UpdatedAt, UpdatedBy)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        record["BatchNumber"],
-        record["ProductID"],
-        record["ProductCode"],
-        record["ProductName"],
-        record["UnitType"],
-        record["QtyUnits"],
-        record["TargetPerUnitLB"],
-        record["TargetPerUnitG"],
-        record["TotalTargetLB"],
-        record["TotalTargetG"],
-        record["Status"],
-        record["Customer"],
-        record["Notes"],
-        record["CreatedAt"],
-        record["CreatedBy"],
-        record["UpdatedAt"],
-        record["UpdatedBy"],
-    ))
-    conn.commit()
-    conn.close()
+    with locked_conn() as conn, conn:
+        conn.execute(_SQL_INSERT_BATCH, tuple(record[c] for c in _BATCH_INSERT_COLS))
 
 def update_batch_status(batch_id: int, new_status: str, user: str):
-    conn = get_conn()
-    conn.execute("""
-        UPDATE ProductionBatch
-        SET Status = ?, UpdatedAt = ?, UpdatedBy = ?
-        WHERE BatchID = ?
-    """, (new_status, datetime.now().isoformat(timespec="seconds"), user, batch_id))
-    conn.commit()
-    conn.close()
+    with locked_conn() as conn, conn:
+        conn.execute(_SQL_UPDATE_STATUS, (new_status, datetime.now().isoformat(timespec="seconds"), user, batch_id))
 
 def get_recent_batches(limit: int = 50) -> pd.DataFrame:
-    conn = get_conn()
-    df = pd.read_sql_query(f"""
-        SELECT
-            BatchID, BatchNumber, ProductCode, ProductName, UnitType,
-            QtyUnits, Status, UpdatedAt, UpdatedBy,
-            TargetPerUnitLB, TargetPerUnitG, TotalTargetLB, TotalTargetG,
-            Customer, Notes
-        FROM ProductionBatch
-        ORDER BY UpdatedAt DESC
-        LIMIT {int(limit)}
-    """, conn)
-    conn.close()
-    return df
+    with locked_conn() as conn:
+        return pd.read_sql_query(_SQL_RECENT_BATCHES, conn, params=(int(limit),))
 
 
 # ----------------------------
@@ -153,19 +210,6 @@ if wt.empty:
     st.error(f"ProductWeightTargets.txt not found or empty: {WEIGHT_TARGETS_PATH}")
     st.stop()
 
-# Ensure types
-pm["ProductID"] = pm["ProductID"].astype(int)
-wt["ProductID"] = wt["ProductID"].astype(int)
-
-# Normalize UnitType so GLUS/QTUS behave correctly
-wt["UnitType"] = (
-    wt["UnitType"]
-    .astype(str)
-    .str.replace('"', '', regex=False)
-    .str.strip()
-    .str.upper()
-)
-
 
 # ----------------------------
 # Create Batch
@@ -177,43 +221,28 @@ batch_number = st.text_input("Batch Number (required)", value="", placeholder="e
 customer = st.text_input("Customer (optional)", value="")
 notes = st.text_area("Notes (optional)", value="")
 
-pm["Display"] = pm["ProductCode"].astype(str) + " — " + pm["ProductName"].astype(str)
-selected_display = st.selectbox("Product", pm["Display"].tolist())
+pm_idx = build_product_index(pm_stamp, pm)
+wt_idx = build_weight_index(wt_stamp, wt)
 
-selected = pm.loc[pm["Display"] == selected_display].iloc[0]
-product_id = int(selected["ProductID"])
-product_code = str(selected["ProductCode"])
-product_name = str(selected["ProductName"])
+selected_display = st.selectbox("Product", pm_idx["displays"])
+product_id, product_code, product_name = pm_idx["by_display"][selected_display]
 
 # UnitType options for this ProductID (from ProductWeightTargets)
-wt_rows = wt.loc[wt["ProductID"] == product_id].copy()
-if wt_rows.empty:
+targets_by_unit = wt_idx["targets"].get(product_id)
+if not targets_by_unit:
     st.error("No weight targets found for this ProductID in ProductWeightTargets.txt")
     st.stop()
-# DEBUG: show available unit types for this product   
-st.write(wt_rows[["ProductID", "UnitType"]])
+# DEBUG: show available unit types for this product
+if DEBUG:
+    st.write(wt.loc[wt["ProductID"] == product_id, ["ProductID", "UnitType"]])
  
 
-unit_options = sorted(
-    wt_rows["UnitType"]
-    .dropna()
-    .astype(str)
-    .str.replace('"', '', regex=False)
-    .str.strip()
-    .str.upper()
-    .unique()
-    .tolist()
-)
+unit_options = wt_idx["unit_options"][product_id]
 
 default_idx = unit_options.index("GLUS") if "GLUS" in unit_options else 0
 unit_type = st.selectbox("UnitType", unit_options, index=default_idx)
 
-row_u = wt_rows.loc[
-    wt_rows["UnitType"].astype(str).str.strip().str.upper() == unit_type
-].iloc[0]
-
-target_lb_per_unit = float(row_u.get("TotalWeightPerUnitLB", 0.0) or 0.0)
-target_g_per_unit = float(row_u.get("TotalWeightPerUnitG", 0.0) or 0.0)
+target_lb_per_unit, target_g_per_unit = targets_by_unit[unit_type]
 
 qty_units = st.number_input("Qty (Units)", min_value=0.0, step=1.0, format="%.4f")
 
@@ -276,14 +305,17 @@ if recent.empty:
     st.info("No production batches created yet.")
     st.stop()
 
+batch_labels = dict(zip(
+    recent["BatchID"],
+    recent["BatchNumber"].astype(str) + " — " + recent["ProductCode"].astype(str),
+))
 batch_id = st.selectbox(
     "Select batch",
-    recent["BatchID"].tolist(),
-    format_func=lambda x: f"{recent.loc[recent.BatchID==x,'BatchNumber'].values[0]} — "
-                          f"{recent.loc[recent.BatchID==x,'ProductCode'].values[0]}",
+    list(batch_labels),
+    format_func=batch_labels.get,
 )
 
-b = recent.loc[recent["BatchID"] == batch_id].iloc[0]
+b = recent.set_index("BatchID").loc[batch_id]
 status = str(b.get("Status") or "PRE-BATCH").upper().strip()
 progress = STATUS_TO_PROGRESS.get(status, 0)
 
@@ -1,5 +1,21 @@
 import streamlit as st
 import pandas as pd
+import sys
+from pathlib import Path
+
+try:
+    import pyarrow  # noqa: F401  (enables pandas' Arrow CSV engine and string dtype)
+    _CSV_ENGINE, _STR_DTYPE = "pyarrow", "string[pyarrow]"
+except ImportError:
+    _CSV_ENGINE, _STR_DTYPE = "c", "string"
+
+# Ensure repo root on path
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from rework_core import align_inputs, compute_max_safe_fraction, compute_plan
+from file_utils import file_stamp
 
 st.title("AWLMIX Rework → Target (Dynamic)")
 
@@ -10,20 +26,38 @@ This tool calculates:
 """)
 
 # ---------- Load materials from CSV ----------
+MATERIALS_PATH = "MaterialMaster.csv"
+
+
 @st.cache_data
-def load_materials_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+def load_materials_csv(path: str, stamp: tuple[int, int] | None):
+    """
+    Selectbox options and a code-indexed name Series, built once per file version.
+    Only these are returned: the cached value is copied back on every rerun.
+    """
+    df = pd.read_csv(
+        path,
+        engine=_CSV_ENGINE,
+        dtype={"MaterialCode": _STR_DTYPE, "MaterialName": _STR_DTYPE},
+    )
     df.columns = [c.strip() for c in df.columns]
 
     if "MaterialCode" not in df.columns or "MaterialName" not in df.columns:
         raise ValueError("CSV must contain columns: MaterialCode, MaterialName")
 
-    df["MaterialCode"] = df["MaterialCode"].astype(str).str.strip()
-    df["MaterialName"] = df["MaterialName"].astype(str).str.strip()
+    # Only the two columns the page uses (smaller cached copy per rerun); already
+    # string-typed on read, so one strip per column and no astype round-trip.
+    df = df[["MaterialCode", "MaterialName"]]
+    df = df.assign(
+        MaterialCode=df["MaterialCode"].str.strip(),
+        MaterialName=df["MaterialName"].fillna("").str.strip(),
+    )
 
     df = df.dropna(subset=["MaterialCode"])
-    df = df.drop_duplicates(subset=["MaterialCode"]).sort_values("MaterialCode")
-    return df
+    df = df.drop_duplicates(subset=["MaterialCode"], keep="first").sort_values("MaterialCode")
+    codes_list = [""] + df["MaterialCode"].tolist()
+    name_map = df.set_index("MaterialCode")["MaterialName"]  # unique index -> hashed .get(code, "")
+    return codes_list, name_map
 
 
 materials_loaded = False
@@ -31,9 +65,7 @@ codes_list = [""]
 name_map = {}
 
 try:
-    materials = load_materials_csv("MaterialMaster.csv")
-    codes_list = [""] + materials["MaterialCode"].tolist()
-    name_map = dict(zip(materials["MaterialCode"], materials["MaterialName"]))
+    codes_list, name_map = load_materials_csv(MATERIALS_PATH, file_stamp(MATERIALS_PATH))
     materials_loaded = True
 except Exception as e:
     st.warning(
@@ -42,108 +74,53 @@ except Exception as e:
     )
     st.caption(f"Debug: {e}")
 
-# ---------- Core logic ----------
-def compute_max_safe_fraction(rework: dict, target: dict):
-    rows = []
-    max_f = float("inf")
-    limiting = None
-
-    shared = sorted(set(rework.keys()) & set(target.keys()))
-    for ing in shared:
-        rw = float(rework.get(ing, 0) or 0)
-        tg = float(target.get(ing, 0) or 0)
-        if rw <= 0:
-            continue
-
-        f_i = tg / rw
-        rows.append({
-            "Ingredient": ing,
-            "Target / Rework": f_i,
-            "Target_g": tg,
-            "Rework_g": rw
-        })
-
-        if f_i < max_f:
-            max_f = f_i
-            limiting = ing
-
-    limits_df = (
-        pd.DataFrame(rows).sort_values("Target / Rework")
-        if rows else
-        pd.DataFrame(columns=["Ingredient", "Target / Rework", "Target_g", "Rework_g"])
+# ---------- Input grids ----------
+def collect_lines(prefix: str, n: int):
+    """
+    One st.data_editor grid of n (MaterialCode, grams) lines instead of 2n widgets.
+    Repeated codes are summed. The editor stores edits by row position, so a new
+    line count re-seeds the grid (under a new key) from the rows already entered,
+    truncated or padded with blank lines.
+    """
+    n = int(n)
+    base = st.session_state.get(f"{prefix}_lines_base")
+    if base is None or len(base) != n:
+        prev = st.session_state.get(f"{prefix}_lines_last")
+        kept = [] if prev is None else [prev.iloc[:n]]
+        pad = n - sum(len(k) for k in kept)
+        if pad:
+            kept.append(pd.DataFrame({"MaterialCode": [""] * pad, "Grams": [0.0] * pad}))
+        base = pd.concat(kept, ignore_index=True)
+        st.session_state[f"{prefix}_lines_base"] = base
+        st.session_state[f"{prefix}_lines_gen"] = st.session_state.get(f"{prefix}_lines_gen", -1) + 1
+
+    if materials_loaded:
+        code_col = st.column_config.SelectboxColumn("MaterialCode", options=codes_list)
+    else:
+        code_col = st.column_config.TextColumn("MaterialCode")
+
+    gen = st.session_state[f"{prefix}_lines_gen"]
+    edited = st.data_editor(
+        base,
+        column_config={
+            "MaterialCode": code_col,
+            "Grams": st.column_config.NumberColumn("Grams (g)", min_value=0.0, step=1.0, format="%.4f"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        key=f"{prefix}_lines_{gen}",
     )
+    st.session_state[f"{prefix}_lines_last"] = edited
 
-    if max_f == float("inf"):
-        return 0.0, "N/A", limits_df
+    codes = edited["MaterialCode"].fillna("").astype(str).str.strip()
+    picked = codes != ""
+    grams = edited["Grams"].fillna(0.0).astype(float)
+    grouped = grams[picked].groupby(codes[picked], sort=False).sum()
 
-    return max_f, limiting, limits_df
+    if materials_loaded and len(grouped):
+        st.caption(" · ".join(f"{c}: {name_map.get(c, '')}" for c in grouped.index))
 
-
-def compute_plan(rework: dict, target: dict, reuse_fraction: float) -> pd.DataFrame:
-    all_ings = sorted(set(rework.keys()) | set(target.keys()))
-    rows = []
-
-    for ing in all_ings:
-        rw = float(rework.get(ing, 0) or 0)
-        tg = float(target.get(ing, 0) or 0)
-        used = reuse_fraction * rw
-        add = tg - used
-
-        rows.append({
-            "Ingredient": ing,
-            "Rework_g": rw,
-            "Target_g": tg,
-            "Used_from_Rework_g": used,
-            "Add_Back_g": add,
-            "Over_Target?": add < -1e-9
-        })
-
-    df = pd.DataFrame(rows)
-    df["Type"] = df.apply(
-        lambda r: "Shared" if (r["Rework_g"] > 0 and r["Target_g"] > 0)
-        else ("Target-only" if r["Target_g"] > 0 else "Rework-only"),
-        axis=1
-    )
-    return df.sort_values(["Type", "Ingredient"]).reset_index(drop=True)
-
-
-def collect_lines(prefix: str, n: int):
-    grams_by_code = {}
-    total = 0.0
-
-    for i in range(int(n)):
-        col_code, col_g = st.columns([1.3, 1.0])
-
-        with col_code:
-            if materials_loaded:
-                code = st.selectbox(
-                    f"{prefix} MaterialCode {i+1}",
-                    options=codes_list,
-                    key=f"{prefix}_code_{i}"
-                )
-                name = name_map.get(code, "")
-                if name:
-                    st.caption(f"Name: {name}")
-            else:
-                code = st.text_input(
-                    f"{prefix} MaterialCode {i+1}",
-                    key=f"{prefix}_code_{i}"
-                ).strip()
-
-        with col_g:
-            g = st.number_input(
-                f"{code} (g)" if code else f"{prefix} Ingredient {i+1} (g)",
-                min_value=0.0,
-                step=1.0,
-                format="%.4f",
-                key=f"{prefix}_g_{i}"
-            )
-
-        if code:
-            grams_by_code[code] = grams_by_code.get(code, 0.0) + float(g)
-            total += float(g)
-
-    return grams_by_code, total
+    return grouped.to_dict(), float(grouped.sum())
 
 
 # ---------- Sidebar ----------
@@ -163,23 +140,28 @@ with st.sidebar:
     )
 
 # ---------- Inputs ----------
-st.subheader("1) Enter Rework (Old Batch)")
-rework_dict, rework_total = collect_lines("RW", n_rework)
-st.write(f"**Rework total:** {rework_total:,.4f} g")
+# One form: grid edits are batched and the page reruns only on Calculate
+with st.form("rework_inputs"):
+    st.subheader("1) Enter Rework (Old Batch)")
+    rework_dict, rework_total = collect_lines("RW", n_rework)
+    st.write(f"**Rework total:** {rework_total:,.4f} g")
+
+    st.subheader("2) Enter Target (New Batch)")
+    target_dict, target_total = collect_lines("TG", n_target)
+    st.write(f"**Target total:** {target_total:,.4f} g")
 
-st.subheader("2) Enter Target (New Batch)")
-target_dict, target_total = collect_lines("TG", n_target)
-st.write(f"**Target total:** {target_total:,.4f} g")
+    calc_submitted = st.form_submit_button("Calculate rework plan")
 
 # ---------- Calculate ----------
 st.subheader("3) Results")
 
-if st.button("Calculate rework plan"):
+if calc_submitted:
     if rework_total <= 0 or target_total <= 0:
         st.error("Rework and Target totals must be greater than zero.")
         st.stop()
 
-    max_f, limiting_ing, limits_df = compute_max_safe_fraction(rework_dict, target_dict)
+    ings, rw_g, tg_g, shared = align_inputs(rework_dict, target_dict)
+    max_f, limiting_ing, limits_df = compute_max_safe_fraction(ings, rw_g, tg_g, shared)
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Max safe reuse (fraction)", f"{max_f:.4f}")
@@ -200,12 +182,14 @@ if st.button("Calculate rework plan"):
     reuse_fraction = reuse_pct / 100.0
     st.write(f"**Reuse selected:** {reuse_pct:.2f}%")
 
-    plan_df = compute_plan(rework_dict, target_dict, reuse_fraction)
+    plan_df = compute_plan(ings, rw_g, tg_g, reuse_fraction)
+
+    used_total, add_total, target_sum = plan_df[["Used_from_Rework_g", "Add_Back_g", "Target_g"]].to_numpy().sum(axis=0)
 
     s1, s2, s3 = st.columns(3)
-    s1.metric("Total from rework used (g)", f"{plan_df['Used_from_Rework_g'].sum():,.2f}")
-    s2.metric("Total add-backs (g)", f"{plan_df['Add_Back_g'].sum():,.2f}")
-    s3.metric("Target total (g)", f"{plan_df['Target_g'].sum():,.2f}")
+    s1.metric("Total from rework used (g)", f"{used_total:,.2f}")
+    s2.metric("Total add-backs (g)", f"{add_total:,.2f}")
+    s3.metric("Target total (g)", f"{target_sum:,.2f}")
 
     st.dataframe(plan_df, use_container_width=True)
 
@@ -215,8 +199,3 @@ if st.button("Calculate rework plan"):
         file_name="awlmix_rework_plan.csv",
         mime="text/csv"
     )
-
-
-
-
-
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
 
@@ -7,31 +8,59 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet
 
 
+# Issue-record table template (built once; reused by every PDF)
+_ISSUE_HEADER = ("MaterialCode", "MaterialName", "Location", "Qty", "UOM", "Notes")
+_ISSUE_COL_WIDTHS = (85, 150, 65, 55, 40, 115)
+_ISSUE_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, 0), 9),
+    ("FONTSIZE", (0, 1), (-1, -1), 8),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+    ("LEFTPADDING", (0, 0), (-1, -1), 4),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+    ("TOPPADDING", (0, 0), (-1, -1), 3),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+])
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    """ReportLab sample stylesheet, built on first use and shared (read-only) afterwards."""
+    return getSampleStyleSheet()
+
+
 def generate_multi_issue_pdf(
     *,
     lines: list[dict],
     issued_by: str,
     header_notes: str = "",
     issued_at: datetime | None = None,
-) -> BytesIO:
+    out_path: str | None = None,
+) -> bytes | str:
     """
     ONE PDF with a table of multiple issued materials.
 
     Each line dict should contain:
       MaterialCode, MaterialName, LocationCode, Lot, Qty, UOM, Notes
+
+    With out_path, ReportLab writes straight to that file and the path is
+    returned (no in-memory copy); otherwise the PDF bytes are returned.
     """
     issued_at = issued_at or datetime.now()
-    buf = BytesIO()
+    buf = None if out_path else BytesIO()
 
     doc = SimpleDocTemplate(
-        buf,
+        out_path or buf,
         pagesize=letter,
         leftMargin=36,
         rightMargin=36,
         topMargin=36,
         bottomMargin=36,
     )
-    styles = getSampleStyleSheet()
+    styles = _styles()
 
     story = []
     story.append(Paragraph("<b>AWLMIX HOUSTON</b>", styles["Title"]))
@@ -44,36 +73,26 @@ def generate_multi_issue_pdf(
         story.append(Paragraph(f"<b>Header Notes:</b> {header_notes.strip()}", styles["Normal"]))
     story.append(Spacer(1, 12))
 
-    data = [["MaterialCode", "MaterialName", "Location","Qty", "UOM", "Notes"]]
-    for ln in lines:
-        data.append([
+    data = [list(_ISSUE_HEADER)] + [
+        [
             str(ln.get("MaterialCode", "")),
             str(ln.get("MaterialName", "")),
             str(ln.get("LocationCode", "")),
             f"{float(ln.get('Qty', 0.0)):.4f}",
             str(ln.get("UOM", "")),
             str(ln.get("Notes", "") or header_notes),
-        ])
-
-    table = Table(data, repeatRows=1, colWidths=[85, 150, 65, 70, 55, 40, 115])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 9),
-        ("FONTSIZE", (0, 1), (-1, -1), 8),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
-        ("LEFTPADDING", (0, 0), (-1, -1), 4),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 4),
-        ("TOPPADDING", (0, 0), (-1, -1), 3),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-    ]))
+        ]
+        for ln in lines
+    ]
+
+    table = Table(data, repeatRows=1, colWidths=_ISSUE_COL_WIDTHS)
+    table.setStyle(_ISSUE_TABLE_STYLE)
 
     story.append(table)
     story.append(Spacer(1, 12))
     story.append(Paragraph("Generated by AWLMIX Inventory App (Streamlit)", styles["Normal"]))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    if out_path:
+        return out_path
+    return buf.getvalue()
@@ -0,0 +1,64 @@
+"""Rework -> target math used by pages/rework.py (no Streamlit dependency)."""
+import numpy as np
+import pandas as pd
+
+# Plan Type by 2-bit code: bit 0 = has rework, bit 1 = has target
+_TYPE_LABELS = np.array(["Rework-only", "Rework-only", "Target-only", "Shared"], dtype=object)
+
+
+def align_inputs(rework: dict, target: dict):
+    """
+    Built once per calculation: the sorted ingredient union, rework / target grams
+    as aligned float64 arrays (missing -> 0), and a mask of ingredients on both sides.
+    """
+    rw_keys, tg_keys = frozenset(rework), frozenset(target)
+    ings = sorted(rw_keys | tg_keys)
+    n = len(ings)
+    rw = np.fromiter((rework.get(k, 0.0) for k in ings), dtype=np.float64, count=n)
+    tg = np.fromiter((target.get(k, 0.0) for k in ings), dtype=np.float64, count=n)
+    shared = np.fromiter((k in rw_keys and k in tg_keys for k in ings), dtype=bool, count=n)
+    return ings, rw, tg, shared
+
+
+def compute_max_safe_fraction(ings: list, rw: np.ndarray, tg: np.ndarray, shared: np.ndarray):
+    keep = shared & (rw > 0)
+    ings = np.asarray(ings, dtype=object)[keep]
+    rw, tg = rw[keep], tg[keep]
+    if not len(ings):
+        return 0.0, "N/A", pd.DataFrame(columns=["Ingredient", "Target / Rework", "Target_g", "Rework_g"])
+
+    ratios = tg / rw
+    order = np.argsort(ratios, kind="stable")
+    limits_df = pd.DataFrame({
+        "Ingredient": ings[order],
+        "Target / Rework": ratios[order],
+        "Target_g": tg[order],
+        "Rework_g": rw[order],
+    })
+
+    i = int(ratios.argmin())  # first minimum, same as the old strict "<" scan
+    return float(ratios[i]), ings[i], limits_df
+
+
+def compute_plan(ings: list, rw: np.ndarray, tg: np.ndarray, reuse_fraction: float, sort: bool = True) -> pd.DataFrame:
+    """
+    Per-ingredient plan. sort=False skips the display ordering for callers that
+    only aggregate; ings is already sorted, so a stable sort on Type alone gives
+    the same (Type, Ingredient) order.
+    """
+    used = reuse_fraction * rw
+    add = tg - used
+
+    df = pd.DataFrame({
+        "Ingredient": ings,
+        "Rework_g": rw,
+        "Target_g": tg,
+        "Used_from_Rework_g": used,
+        "Add_Back_g": add,
+        "Over_Target?": add < -1e-9,
+    })
+    type_code = (rw > 0).view(np.int8) | ((tg > 0).view(np.int8) << 1)
+    df["Type"] = _TYPE_LABELS[type_code]
+    if not sort:
+        return df
+    return df.sort_values("Type", kind="stable", ignore_index=True)
@@ -0,0 +1,89 @@
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+# Per-session state on disk (carts, last posted PDFs) so a refresh or server
+# restart doesn't lose work and PDF bytes aren't pinned in session memory.
+SESSIONS_DIR = Path(os.environ.get("AWLMIX_SESSIONS_DIR", str(Path.home() / ".awlmix" / "sessions")))
+
+# Files untouched for this long are removed by prune()
+SESSION_TTL_S = 7 * 24 * 3600
+
+# Session ids come from the URL: only uuid4().hex is accepted, so an id can
+# never carry path separators or "..".
+_SID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_sid() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_sid(sid) -> bool:
+    return isinstance(sid, str) and _SID_RE.match(sid) is not None
+
+
+def _path(sid: str, key: str, suffix: str) -> Path:
+    if not valid_sid(sid):
+        raise ValueError(f"invalid session id: {sid!r}")
+    return SESSIONS_DIR / f"{sid}_{key}{suffix}"
+
+
+def _atomic_write(path: Path, data) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return path
+
+
+def _json_default(o):
+    # numpy scalars (e.g. IDs picked from a DataFrame column) -> plain Python values
+    return o.item() if hasattr(o, "item") else str(o)
+
+
+def save(sid: str, key: str, obj) -> None:
+    """Store a JSON-serializable object for this session."""
+    _atomic_write(_path(sid, key, ".json"), json.dumps(obj, default=_json_default).encode("utf-8"))
+
+
+def load(sid: str, key: str, default=None):
+    path = _path(sid, key, ".json")
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def blob_path(sid: str, key: str, suffix: str = ".bin") -> str:
+    """Path for a file (e.g. a PDF) kept next to the session JSON; the directory is created."""
+    SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    return str(_path(sid, key, suffix))
+
+
+def delete(sid: str, key: str, *blob_paths: str) -> None:
+    for path in (_path(sid, key, ".json"), *map(Path, blob_paths)):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def prune(max_age_s: float = SESSION_TTL_S) -> int:
+    """Remove session files not modified within max_age_s; returns the number removed."""
+    cutoff = time.time() - max_age_s
+    removed = 0
+    try:
+        entries = list(os.scandir(SESSIONS_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed